@@ -0,0 +1,53 @@
+import collections
+import threading
+
+from qtpy import QtCore
+
+from labelme.logger import logger
+
+
+class AutoSaver(QtCore.QObject):
+    """Run save requests on a worker thread.
+
+    Requests for the same filename are coalesced: only the latest pending
+    request per filename is run, so stale saves are dropped.
+    """
+
+    saveFailed = QtCore.Signal(str, str)
+
+    def __init__(self, parent=None):
+        super(AutoSaver, self).__init__(parent)
+        self._condition = threading.Condition()
+        self._pending = collections.OrderedDict()  # filename -> save
+        self._saving = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, filename, save):
+        with self._condition:
+            self._pending.pop(filename, None)
+            self._pending[filename] = save
+            self._condition.notify_all()
+
+    def flush(self):
+        """Block until all the pending requests are saved."""
+        with self._condition:
+            while self._pending or self._saving:
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                filename, save = self._pending.popitem(last=False)
+                self._saving = True
+            try:
+                logger.debug("Auto saving: {}".format(filename))
+                save()
+            except Exception as e:
+                self.saveFailed.emit(filename, str(e))
+            finally:
+                with self._condition:
+                    self._saving = False
+                    self._condition.notify_all()
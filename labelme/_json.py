@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """Load JSON from UTF-8 bytes."""
+    if orjson is None:
+        return json.loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # orjson rejects NaN and Infinity, which the json module writes
+        return json.loads(data)
+
+
+def load(f):
+    """Load JSON from a file opened in binary mode."""
+    return loads(f.read())
+
+
+def _default(obj):
+    # numpy values, e.g., in otherData and flags set by scripts
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(obj).__name__)
+    )
+
+
+def dumps(obj, compact=False):
+    """Dump JSON to UTF-8 bytes.
+
+    The output is indented by 2 spaces as json.dump(..., indent=2) unless
+    compact is True. The bytes may differ between the backends, e.g., orjson
+    writes 1e-07 as 1e-7, and NaN and Infinity as null.
+    """
+    if orjson is None:
+        if compact:
+            kwargs = dict(separators=(",", ":"))
+        else:
+            kwargs = dict(indent=2)
+        return json.dumps(obj, ensure_ascii=False, default=_default, **kwargs).encode(
+            "utf-8"
+        )
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def dump(obj, f, compact=False):
+    """Dump JSON in UTF-8 to a file opened in binary mode, see dumps."""
+    f.write(dumps(obj, compact=compact))
@@ -0,0 +1,99 @@
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JsonStreamReader(object):
+    """Incremental reader of a JSON document from a text file object.
+
+    Values are decoded one at a time with json.JSONDecoder.raw_decode, so the
+    memory usage is bounded by the largest single value that is decoded.
+    """
+
+    def __init__(self, f, chunk_size=65536):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _read_more(self):
+        if self._eof:
+            return False
+        # grow geometrically so that a huge value is not re-parsed too many times
+        size = max(self._chunk_size, len(self._buffer) - self._pos)
+        chunk = self._f.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(
+                "Expected {!r} but got {!r}".format(char, self._buffer[self._pos])
+            )
+        self._pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            if (
+                isinstance(value, (int, float))
+                and (end == len(self._buffer) or self._buffer[end] in "eE.")
+                and self._read_more()
+            ):
+                # a number may continue in the next chunk, e.g., '12' of '123'
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self):
+        """Yield keys of an object, the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' or '}}' but got {!r}".format(char))
+
+    def iter_array(self):
+        """Yield items of an array, decoding them one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            char = self.peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' or ']' but got {!r}".format(char))
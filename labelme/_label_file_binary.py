@@ -0,0 +1,88 @@
+import numpy as np
+
+from labelme import _json
+from labelme import utils
+
+# Binary container of a label file, which is a npz archive of:
+# - meta: utf-8 JSON of the label file without points, masks and imageData
+# - points: (N, 2) float64 points of all shapes concatenated
+# - points_offsets: (num_shapes + 1,) offsets of each shape in points
+# - masks: bit-packed masks of all shapes concatenated
+# - mask_shapes: (num_masks, 2) height and width of each mask
+# - mask_indices: (num_shapes,) index in mask_shapes, or -1 for no mask
+# - imageData: raw bytes of the image file (optional)
+
+
+def dump(data, f):
+    meta = {key: value for key, value in data.items() if key != "imageData"}
+    meta["shapes"] = []
+
+    points = []
+    points_offsets = [0]
+    masks = []
+    mask_shapes = []
+    mask_indices = []
+    for shape in data["shapes"]:
+        shape = dict(shape)
+
+        shape_points = np.asarray(shape.pop("points"), dtype=np.float64)
+        shape_points = shape_points.reshape(-1, 2)
+        points.append(shape_points)
+        points_offsets.append(points_offsets[-1] + len(shape_points))
+
+        mask = shape.pop("mask", None)
+        if mask is None:
+            mask_indices.append(-1)
+        else:
+            if isinstance(mask, dict):
+                mask = utils.rle_to_mask(mask)
+            elif isinstance(mask, str):
+                mask = utils.img_b64_to_arr(mask)
+            mask = np.asarray(mask, dtype=bool)
+            mask_indices.append(len(mask_shapes))
+            mask_shapes.append(mask.shape)
+            masks.append(np.packbits(mask))
+
+        meta["shapes"].append(shape)
+
+    arrays = dict(
+        meta=np.frombuffer(_json.dumps(meta, compact=True), dtype=np.uint8),
+        points=np.concatenate(points) if points else np.empty((0, 2)),
+        points_offsets=np.asarray(points_offsets, dtype=np.int64),
+        masks=np.concatenate(masks) if masks else np.empty((0,), dtype=np.uint8),
+        mask_shapes=np.asarray(mask_shapes, dtype=np.int64).reshape(-1, 2),
+        mask_indices=np.asarray(mask_indices, dtype=np.int64),
+    )
+    if data["imageData"] is not None:
+        arrays["imageData"] = np.frombuffer(data["imageData"], dtype=np.uint8)
+    np.savez(f, **arrays)
+
+
+def load(f):
+    with np.load(f, allow_pickle=False) as npz:
+        data = _json.loads(npz["meta"].tobytes())
+        points = npz["points"]
+        points_offsets = npz["points_offsets"]
+        masks = npz["masks"]
+        mask_shapes = npz["mask_shapes"]
+        mask_indices = npz["mask_indices"]
+        if "imageData" in npz.files:
+            data["imageData"] = npz["imageData"].tobytes()
+        else:
+            data["imageData"] = None
+
+    mask_offsets = np.r_[0, np.cumsum((mask_shapes.prod(axis=1) + 7) // 8)]
+    for i, shape in enumerate(data["shapes"]):
+        shape["points"] = points[points_offsets[i] : points_offsets[i + 1]].tolist()
+
+        mask_index = mask_indices[i]
+        if mask_index == -1:
+            shape["mask"] = None
+            continue
+        height, width = mask_shapes[mask_index]
+        mask = np.unpackbits(
+            masks[mask_offsets[mask_index] : mask_offsets[mask_index + 1]],
+            count=height * width,
+        )
+        shape["mask"] = mask.reshape(height, width).astype(bool)
+    return data
@@ -0,0 +1,81 @@
+import concurrent.futures
+import sys
+import threading
+
+from qtpy import QtGui
+
+from labelme import utils
+from labelme.label_file import LabelFile
+from labelme.logger import logger
+
+
+def load_image_array(filename, label_file=None):
+    """Load an image as the same RGBA array that MainWindow.loadFile makes."""
+    if label_file is None:
+        imageData = LabelFile.load_image_file(filename)
+    else:
+        imageData = LabelFile(label_file, lazy=True).imageData
+    if not imageData:
+        return None
+    image = QtGui.QImage.fromData(imageData)
+    if image.isNull():
+        return None
+    return utils.img_qt_to_arr(image)
+
+
+class EmbeddingPrefetcher(object):
+    """Compute image embeddings of upcoming images in the background.
+
+    Each prefetch cancels the previous one, so that only the images near the
+    current one are encoded, and at most max_workers encoders run at once.
+    A running encoder cannot be interrupted, so cancelling stops the images
+    that are not being encoded yet.
+    """
+
+    def __init__(self, max_workers=1):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="EmbeddingPrefetcher"
+        )
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+
+    def prefetch(self, model, image_loaders):
+        """Prefetch embeddings of the images, each loaded by a callable."""
+        generation = self.cancel()
+        self._futures = [
+            self._executor.submit(self._prefetch, generation, model, load_image)
+            for load_image in image_loaders
+        ]
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        return generation
+
+    def shutdown(self):
+        """Cancel the prefetches and stop the workers without waiting for them."""
+        self.cancel()
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._executor.shutdown(wait=False)
+
+    def _is_cancelled(self, generation):
+        with self._lock:
+            return generation != self._generation
+
+    def _prefetch(self, generation, model, load_image):
+        try:
+            if self._is_cancelled(generation):
+                return
+            image = load_image()
+            if image is None or self._is_cancelled(generation):
+                return
+            model.prefetch_image_embedding(image)
+        except Exception as e:
+            logger.warning("Failed to prefetch image embedding: {}".format(e))
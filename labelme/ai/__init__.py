@@ -1,89 +1,106 @@
-import gdown
+import os.path as osp
 
+from ._embedding_cache import EmbeddingCache
+from ._server import ModelClient  # NOQA: F401
+from ._server import read_authkey  # NOQA: F401
+from ._server import serve  # NOQA: F401
 from .efficient_sam import EfficientSam
 from .segment_anything_model import SegmentAnythingModel
+from .text_to_annotation import get_box_prompts  # NOQA: F401
 from .text_to_annotation import get_rectangles_from_texts  # NOQA: F401
 from .text_to_annotation import get_shapes_from_annotations  # NOQA: F401
 from .text_to_annotation import non_maximum_suppression  # NOQA: F401
 
 
+def _cached_download(url, md5):
+    # gdown is imported only when an AI model is initialized for faster startup
+    import gdown
+
+    return gdown.cached_download(url=url, md5=md5)
+
+
 class SegmentAnythingModelVitB(SegmentAnythingModel):
     name = "SegmentAnything (speed)"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(
-            encoder_path=gdown.cached_download(
+            encoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_b_01ec64.quantized.encoder.onnx",  # NOQA
                 md5="80fd8d0ab6c6ae8cb7b3bd5f368a752c",
             ),
-            decoder_path=gdown.cached_download(
+            decoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_b_01ec64.quantized.decoder.onnx",  # NOQA
                 md5="4253558be238c15fc265a7a876aaec82",
             ),
+            **kwargs,
         )
 
 
 class SegmentAnythingModelVitL(SegmentAnythingModel):
     name = "SegmentAnything (balanced)"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(
-            encoder_path=gdown.cached_download(
+            encoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_l_0b3195.quantized.encoder.onnx",  # NOQA
                 md5="080004dc9992724d360a49399d1ee24b",
             ),
-            decoder_path=gdown.cached_download(
+            decoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_l_0b3195.quantized.decoder.onnx",  # NOQA
                 md5="851b7faac91e8e23940ee1294231d5c7",
             ),
+            **kwargs,
         )
 
 
 class SegmentAnythingModelVitH(SegmentAnythingModel):
     name = "SegmentAnything (accuracy)"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(
-            encoder_path=gdown.cached_download(
+            encoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_h_4b8939.quantized.encoder.onnx",  # NOQA
                 md5="958b5710d25b198d765fb6b94798f49e",
             ),
-            decoder_path=gdown.cached_download(
+            decoder_path=_cached_download(
                 url="https://github.com/wkentaro/labelme/releases/download/sam-20230416/sam_vit_h_4b8939.quantized.decoder.onnx",  # NOQA
                 md5="a997a408347aa081b17a3ffff9f42a80",
             ),
+            **kwargs,
         )
 
 
 class EfficientSamVitT(EfficientSam):
     name = "EfficientSam (speed)"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(
-            encoder_path=gdown.cached_download(
+            encoder_path=_cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vitt_encoder.onnx",  # NOQA
                 md5="2d4a1303ff0e19fe4a8b8ede69c2f5c7",
             ),
-            decoder_path=gdown.cached_download(
+            decoder_path=_cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vitt_decoder.onnx",  # NOQA
                 md5="be3575ca4ed9b35821ac30991ab01843",
             ),
+            **kwargs,
         )
 
 
 class EfficientSamVitS(EfficientSam):
     name = "EfficientSam (accuracy)"
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         super().__init__(
-            encoder_path=gdown.cached_download(
+            encoder_path=_cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vits_encoder.onnx",  # NOQA
                 md5="7d97d23e8e0847d4475ca7c9f80da96d",
             ),
-            decoder_path=gdown.cached_download(
+            decoder_path=_cached_download(
                 url="https://github.com/labelmeai/efficient-sam/releases/download/onnx-models-20231225/efficient_sam_vits_decoder.onnx",  # NOQA
                 md5="d9372f4a7bbb1a01d236b0508300b994",
             ),
+            **kwargs,
         )
 
 
@@ -94,3 +111,42 @@ MODELS = [
     EfficientSamVitT,
     EfficientSamVitS,
 ]
+
+
+def get_model_kwargs(ai_config):
+    """Get keyword arguments of the models from the ai section of the config."""
+    kwargs = {}
+    cache_config = ai_config["embedding_cache"]
+    if cache_config["enabled"]:
+        cache_dir = cache_config["dir"]
+        if cache_dir is None:
+            cache_dir = osp.expanduser("~/.cache/labelme/embeddings")
+        kwargs["embedding_cache"] = EmbeddingCache(
+            cache_dir=cache_dir,
+            max_size=cache_config["max_size_mb"] * 1024 * 1024,
+        )
+
+    session_config = dict(ai_config["onnxruntime"])
+    optimized_model_cache = session_config.pop("optimized_model_cache")
+    if optimized_model_cache["enabled"]:
+        optimized_model_dir = optimized_model_cache["dir"]
+        if optimized_model_dir is None:
+            optimized_model_dir = osp.expanduser("~/.cache/labelme/onnx")
+        session_config["optimized_model_dir"] = optimized_model_dir
+    kwargs["session_config"] = session_config
+
+    tiling_config = ai_config["tiling"]
+    if tiling_config["enabled"]:
+        kwargs["tile_size"] = tiling_config["tile_size"]
+        kwargs["min_tiled_image_size"] = tiling_config["min_image_size"]
+    return kwargs
+
+
+def get_server_config(ai_config):
+    """Get the address and the key file of the model server from the config."""
+    server_config = dict(ai_config["server"])
+    if server_config["address"] is None:
+        server_config["address"] = osp.expanduser("~/.cache/labelme/ai_server.sock")
+    if server_config["authkey_file"] is None:
+        server_config["authkey_file"] = osp.expanduser("~/.cache/labelme/ai_server.key")
+    return server_config
@@ -0,0 +1,70 @@
+import os
+import os.path as osp
+import uuid
+
+import numpy as np
+
+from ..logger import logger
+
+
+class EmbeddingCache(object):
+    """Image embeddings cached as .npy files in a directory.
+
+    Embeddings are loaded as memory-mapped arrays, and written to a temporary
+    file that is renamed, so the directory can be shared by multiple processes
+    and sessions. When the total size exceeds max_size bytes, the least
+    recently used files (by modification time) are removed.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+
+    def _get_filename(self, key):
+        return osp.join(self._cache_dir, key + ".npy")
+
+    def get(self, key):
+        filename = self._get_filename(key)
+        try:
+            embedding = np.load(filename, mmap_mode="r")
+            os.utime(filename)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return embedding
+
+    def put(self, key, embedding):
+        filename = self._get_filename(key)
+        tmp_filename = "{}.{}.tmp".format(filename, uuid.uuid4().hex)
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with open(tmp_filename, "xb") as f:
+                np.save(f, embedding)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.warning("Failed to cache image embedding: {}".format(e))
+            if osp.exists(tmp_filename):
+                os.remove(tmp_filename)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self._cache_dir):
+            if not entry.name.endswith(".npy"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:  # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:  # removed by another process, or mapped on Windows
+                continue
+            logger.debug("Evicted image embedding: {!r}".format(path))
+            total_size -= size
@@ -0,0 +1,200 @@
+import collections
+import os.path as osp
+import threading
+
+import numpy as np
+
+from ..logger import logger
+from . import _tiling
+from . import _utils
+from ._session import create_inference_session
+
+
+class ImageEmbeddingModel(object):
+    """Model that encodes an image once and decodes masks from prompts.
+
+    The embeddings are cached, prefetched and computed in tiles here, and
+    subclasses implement _encode_image and _compute_masks with their sessions.
+    """
+
+    def __init__(
+        self,
+        encoder_path,
+        decoder_path,
+        embedding_cache=None,
+        session_config=None,
+        tile_size=None,
+        min_tiled_image_size=4096,
+    ):
+        # keyword arguments of create_inference_session, e.g., providers
+        if session_config is None:
+            session_config = {}
+        self._encoder_session = create_inference_session(encoder_path, **session_config)
+        self._decoder_session = create_inference_session(decoder_path, **session_config)
+
+        self._lock = threading.Lock()
+        self._image_embedding_cache = collections.OrderedDict()
+        # persistent cache shared across sessions, see EmbeddingCache
+        self._embedding_cache = embedding_cache
+        self._embedding_cache_prefix = osp.splitext(osp.basename(encoder_path))[0]
+
+        # images larger than min_tiled_image_size, e.g., orthophotos, are
+        # encoded in tiles around the prompts to predict masks in full resolution
+        self._tile_size = tile_size
+        self._min_tiled_image_size = min_tiled_image_size
+
+        self._thread = None
+
+    def _encode_image(self, image):
+        """Return the embedding of the image with the encoder session."""
+        raise NotImplementedError
+
+    def _compute_masks(self, image, image_embedding, points_list, point_labels_list):
+        """Return the masks of the prompts with the decoder session."""
+        raise NotImplementedError
+
+    def set_image(self, image: np.ndarray):
+        with self._lock:
+            self._image = image
+            # digest instead of image.tobytes() to avoid copying the image
+            self._image_hash = _utils.compute_image_hash(image)
+            self._image_tile_size = self._get_tile_size(image)
+            self._image_embedding = self._get_cached_image_embedding(self._image_hash)
+
+            # the embedding of the whole image is computed only if needed for
+            # tiles, and the thread of the previous image is not waited for
+            if self._image_embedding is None and self._image_tile_size is None:
+                self._thread = threading.Thread(
+                    target=self._compute_and_cache_image_embedding
+                )
+                self._thread.start()
+            else:
+                self._thread = None
+
+    def _compute_and_cache_image_embedding(self):
+        with self._lock:
+            image, image_hash = self._image, self._image_hash
+        # the lock is not held while encoding, so set_image is not blocked
+        logger.debug("Computing image embedding...")
+        image_embedding = self._encode_image(image)
+        with self._lock:
+            self._cache_image_embedding(image_hash, image_embedding)
+            if self._image_hash == image_hash:
+                self._image_embedding = image_embedding
+        logger.debug("Done computing image embedding.")
+
+    def prefetch_image_embedding(self, image: np.ndarray):
+        """Compute and cache the embedding of an image to be set later."""
+        if self._get_tile_size(image) is not None:
+            return  # tiles are encoded around the prompts
+        image_hash = _utils.compute_image_hash(image)
+        with self._lock:
+            if self._get_cached_image_embedding(image_hash) is not None:
+                return
+        # the lock is not held while encoding, so set_image is not blocked
+        logger.debug("Prefetching image embedding...")
+        image_embedding = self._encode_image(image)
+        with self._lock:
+            self._cache_image_embedding(image_hash, image_embedding)
+        logger.debug("Done prefetching image embedding.")
+
+    def _get_cached_image_embedding(self, image_hash):
+        image_embedding = self._image_embedding_cache.get(image_hash)
+        if image_embedding is None and self._embedding_cache is not None:
+            image_embedding = self._embedding_cache.get(
+                self._get_embedding_cache_key(image_hash)
+            )
+        return image_embedding
+
+    def _cache_image_embedding(self, image_hash, image_embedding):
+        if len(self._image_embedding_cache) > 10:
+            self._image_embedding_cache.popitem(last=False)
+        self._image_embedding_cache[image_hash] = image_embedding
+        if self._embedding_cache is not None:
+            self._embedding_cache.put(
+                self._get_embedding_cache_key(image_hash), image_embedding
+            )
+
+    def _get_embedding_cache_key(self, image_hash):
+        return "{}-{}".format(self._embedding_cache_prefix, image_hash)
+
+    def _get_image_embedding(self):
+        # not cleared after join, since this is also called from other threads
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if self._image_embedding is not None:
+                return self._image_embedding
+            image, image_hash = self._image, self._image_hash
+        # not computed in set_image for images encoded in tiles
+        image_embedding = self._encode_image(image)
+        with self._lock:
+            self._cache_image_embedding(image_hash, image_embedding)
+            if self._image_hash == image_hash:
+                self._image_embedding = image_embedding
+        return image_embedding
+
+    def _get_tile_size(self, image):
+        return _tiling.get_tile_size(
+            image, tile_size=self._tile_size, min_image_size=self._min_tiled_image_size
+        )
+
+    def _get_tile_embedding(self, tile):
+        with self._lock:
+            image, image_hash = self._image, self._image_hash
+            key = "{}-{}".format(image_hash, "-".join(str(v) for v in tile))
+            tile_embedding = self._get_cached_image_embedding(key)
+        if tile_embedding is not None:
+            return tile_embedding
+        # the key has the digest of the image, so the embedding is cached even
+        # if the image is changed while encoding
+        logger.debug("Computing tile embedding: {}".format(tile))
+        x1, y1, x2, y2 = tile
+        tile_embedding = self._encode_image(image[y1:y2, x1:x2])
+        with self._lock:
+            self._cache_image_embedding(key, tile_embedding)
+        return tile_embedding
+
+    def predict_mask_from_points(self, points, point_labels):
+        (mask,) = self.predict_masks_from_prompts(
+            points_list=[points], point_labels_list=[point_labels]
+        )
+        return mask
+
+    def predict_masks_from_prompts(self, points_list, point_labels_list):
+        """Predict a mask for each of the prompts.
+
+        The prompts are padded to the same number of points and decoded in one
+        run for each embedding (the image or a tile), if the decoder accepts any
+        number of prompts. A decoder exported for a fixed number of prompts is
+        run for each prompt.
+
+        Each prompt is points and their labels: 1 for foreground, 0 for
+        background, and 2 and 3 for the top-left and bottom-right of a box.
+        """
+        masks_with_offsets = self._predict_masks_with_offsets(
+            points_list=points_list, point_labels_list=point_labels_list
+        )
+        return [
+            _tiling.paste_mask(mask, offset=offset, image_shape=self._image.shape)
+            for mask, offset in masks_with_offsets
+        ]
+
+    def _predict_masks_with_offsets(self, points_list, point_labels_list):
+        return _tiling.predict_masks(
+            image=self._image,
+            points_list=points_list,
+            point_labels_list=point_labels_list,
+            tile_size=self._image_tile_size,
+            get_image_embedding=self._get_image_embedding,
+            get_tile_embedding=self._get_tile_embedding,
+            compute_masks=self._compute_masks,
+        )
+
+    def predict_polygon_from_points(self, points, point_labels):
+        # the polygon is computed in the tile without pasting the mask
+        ((mask, offset),) = self._predict_masks_with_offsets(
+            points_list=[points], point_labels_list=[point_labels]
+        )
+        return _utils.compute_polygon_from_mask(mask=mask) + offset
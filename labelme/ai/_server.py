@@ -0,0 +1,266 @@
+import collections
+import copy
+import multiprocessing.connection
+import os
+import os.path as osp
+import threading
+
+from ..logger import logger
+from . import _utils
+
+# methods of the models that are served with an image set by set_image
+_PREDICT_METHODS = [
+    "predict_mask_from_points",
+    "predict_polygon_from_points",
+    "predict_masks_from_prompts",
+]
+_COMMANDS = ["set_image", "predict", "prefetch_image_embedding"]
+
+
+def read_authkey(authkey_file, create=False):
+    """Read the key to authenticate clients, creating it if create is True.
+
+    The key file should be readable only by the users allowed to use the
+    server, since requests are pickled.
+    """
+    if create and not osp.exists(authkey_file):
+        if osp.dirname(authkey_file):
+            os.makedirs(osp.dirname(authkey_file), exist_ok=True)
+        fd = os.open(authkey_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32).hex().encode("ascii"))
+    with open(authkey_file, "rb") as f:
+        return f.read().strip()
+
+
+class _MissingImageError(Exception):
+    pass
+
+
+class _ModelServer(object):
+    def __init__(self, models, model_kwargs, max_images=16):
+        self._model_classes = {model.name: model for model in models}
+        self._model_kwargs = model_kwargs
+        self._max_images = max_images
+        self._lock = threading.Lock()
+        self._models = {}  # name -> model
+        self._images = collections.OrderedDict()  # (name, image_hash) -> model
+
+    def _get_model(self, name):
+        if name not in self._model_classes:
+            raise ValueError("Unsupported ai model: {}".format(name))
+        with self._lock:
+            if name not in self._models:
+                logger.info("Initializing AI model: {!r}".format(name))
+                self._models[name] = self._model_classes[name](**self._model_kwargs)
+            return self._models[name]
+
+    def set_image(self, name, image):
+        model = self._get_model(name)
+        image_hash = _utils.compute_image_hash(image)
+        key = (name, image_hash)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return image_hash
+        # shallow copy shares the sessions and the embedding caches, and
+        # set_image replaces the image only in the copy
+        model_with_image = copy.copy(model)
+        model_with_image.set_image(image)
+        with self._lock:
+            self._images[key] = model_with_image
+            while len(self._images) > self._max_images:
+                self._images.popitem(last=False)
+        return image_hash
+
+    def predict(self, name, image_hash, method, kwargs):
+        if method not in _PREDICT_METHODS:
+            raise ValueError("Unsupported method: {}".format(method))
+        with self._lock:
+            model_with_image = self._images.get((name, image_hash))
+        if model_with_image is None:
+            raise _MissingImageError
+        return getattr(model_with_image, method)(**kwargs)
+
+    def prefetch_image_embedding(self, name, image):
+        self._get_model(name).prefetch_image_embedding(image)
+
+    def handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    command, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if command not in _COMMANDS:
+                        raise ValueError("Unsupported command: {}".format(command))
+                    response = ("ok", getattr(self, command)(**kwargs))
+                except _MissingImageError:
+                    response = ("missing_image", None)
+                except Exception as e:
+                    logger.exception("Failed to handle {!r}".format(command))
+                    response = ("error", "{}: {}".format(type(e).__name__, e))
+                try:
+                    conn.send(response)
+                except OSError:
+                    return
+
+
+def serve(address, authkey, models, model_kwargs, max_images=16):
+    """Serve AI models to ModelClient of labelme instances at the address.
+
+    One process owns the sessions and the embedding caches of the models, and
+    each connection is handled on its own thread.
+    """
+    if multiprocessing.connection.address_type(address) == "AF_UNIX" and osp.exists(
+        address
+    ):
+        logger.warning("Removing stale socket: {!r}".format(address))
+        os.remove(address)
+    server = _ModelServer(
+        models=models, model_kwargs=model_kwargs, max_images=max_images
+    )
+    with multiprocessing.connection.Listener(address, authkey=authkey) as listener:
+        logger.info("Serving AI models at: {!r}".format(address))
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, multiprocessing.AuthenticationError) as e:
+                logger.warning("Failed to accept a connection: {}".format(e))
+                continue
+            threading.Thread(target=server.handle, args=(conn,), daemon=True).start()
+
+
+# errors of the connection, e.g., when the server is stopped or restarted
+_CONNECTION_ERRORS = (EOFError, OSError, multiprocessing.AuthenticationError)
+
+
+class ModelClient(object):
+    """Client of a model served by serve(), with the interface of the models.
+
+    Each thread has its own connection, and requests carry the digest of the
+    image, so the server does not depend on the order of the requests.
+    If fallback is given, it is called to create a local model that serves
+    the requests after the connection to the server is lost.
+    """
+
+    def __init__(self, name, address, authkey, fallback=None):
+        self.name = name
+        self._address = address
+        self._authkey = authkey
+        self._fallback = fallback
+        self._fallback_lock = threading.Lock()
+        self._fallback_model = None
+        self._local = threading.local()
+        self._image = None
+        self._image_hash = None
+
+    def connect(self):
+        """Connect to the server, raising OSError if it is not running."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = multiprocessing.connection.Client(
+                self._address, authkey=self._authkey
+            )
+            self._local.conn = conn
+        return conn
+
+    def _call(self, command, **kwargs):
+        conn = self.connect()
+        try:
+            conn.send((command, kwargs))
+            status, value = conn.recv()
+        except _CONNECTION_ERRORS:
+            # reconnect at the next call, e.g., after the server is restarted
+            self._local.conn = None
+            conn.close()
+            raise
+        if status == "error":
+            raise RuntimeError("AI model server: {}".format(value))
+        return status, value
+
+    def _get_fallback_model(self, error=None):
+        with self._fallback_lock:
+            if self._fallback_model is None and error is not None:
+                if self._fallback is None:
+                    raise error
+                logger.warning(
+                    "Lost the connection to the AI model server, "
+                    "so using the local model: {}".format(error)
+                )
+                model = self._fallback()
+                if self._image is not None:
+                    model.set_image(self._image)
+                self._fallback_model = model
+            return self._fallback_model
+
+    def set_image(self, image):
+        if self._get_fallback_model() is None:
+            try:
+                _, image_hash = self._call("set_image", name=self.name, image=image)
+            except _CONNECTION_ERRORS as e:
+                self._image, self._image_hash = image, None
+                # the fallback model is created with the image
+                self._get_fallback_model(error=e)
+            else:
+                self._image, self._image_hash = image, image_hash
+            return
+        self._image, self._image_hash = image, None
+        self._get_fallback_model().set_image(image)
+
+    def prefetch_image_embedding(self, image):
+        if self._get_fallback_model() is None:
+            try:
+                self._call("prefetch_image_embedding", name=self.name, image=image)
+                return
+            except _CONNECTION_ERRORS as e:
+                self._get_fallback_model(error=e)
+        self._get_fallback_model().prefetch_image_embedding(image)
+
+    def _predict(self, method, **kwargs):
+        if self._get_fallback_model() is None:
+            try:
+                return self._predict_on_server(method, **kwargs)
+            except _CONNECTION_ERRORS as e:
+                self._get_fallback_model(error=e)
+        return getattr(self._get_fallback_model(), method)(**kwargs)
+
+    def _predict_on_server(self, method, **kwargs):
+        image, image_hash = self._image, self._image_hash
+        status, value = self._call(
+            "predict",
+            name=self.name,
+            image_hash=image_hash,
+            method=method,
+            kwargs=kwargs,
+        )
+        if status == "missing_image":  # evicted on the server
+            _, image_hash = self._call("set_image", name=self.name, image=image)
+            status, value = self._call(
+                "predict",
+                name=self.name,
+                image_hash=image_hash,
+                method=method,
+                kwargs=kwargs,
+            )
+            if status == "missing_image":
+                raise RuntimeError("AI model server: image is evicted")
+        return value
+
+    def predict_mask_from_points(self, points, point_labels):
+        return self._predict(
+            "predict_mask_from_points", points=points, point_labels=point_labels
+        )
+
+    def predict_polygon_from_points(self, points, point_labels):
+        return self._predict(
+            "predict_polygon_from_points", points=points, point_labels=point_labels
+        )
+
+    def predict_masks_from_prompts(self, points_list, point_labels_list):
+        return self._predict(
+            "predict_masks_from_prompts",
+            points_list=points_list,
+            point_labels_list=point_labels_list,
+        )
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import os.path as osp
+import uuid
+
+from ..logger import logger
+
+# names of onnxruntime.GraphOptimizationLevel, as onnxruntime is imported lazily
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def create_inference_session(
+    model_path,
+    providers=None,
+    intra_op_num_threads=0,
+    inter_op_num_threads=0,
+    graph_optimization_level="all",
+    enable_mem_pattern=True,
+    enable_cpu_mem_arena=True,
+    optimized_model_dir=None,
+):
+    """Create an onnxruntime.InferenceSession with the options.
+
+    If optimized_model_dir is given, the optimized graph is saved there at the
+    first time, and loaded without optimization at the next time.
+    """
+    import onnxruntime
+
+    if graph_optimization_level not in _GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(
+            "Unexpected graph_optimization_level: {}".format(graph_optimization_level)
+        )
+
+    def get_level(name):
+        return getattr(
+            onnxruntime.GraphOptimizationLevel, _GRAPH_OPTIMIZATION_LEVELS[name]
+        )
+
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = intra_op_num_threads
+    sess_options.inter_op_num_threads = inter_op_num_threads
+    sess_options.enable_mem_pattern = enable_mem_pattern
+    sess_options.enable_cpu_mem_arena = enable_cpu_mem_arena
+    sess_options.graph_optimization_level = get_level(graph_optimization_level)
+
+    if optimized_model_dir is None or graph_optimization_level == "disable":
+        return onnxruntime.InferenceSession(
+            model_path, sess_options=sess_options, providers=providers
+        )
+
+    optimized_model_path = _get_optimized_model_path(
+        optimized_model_dir=optimized_model_dir,
+        model_path=model_path,
+        providers=providers,
+        graph_optimization_level=graph_optimization_level,
+    )
+    if osp.exists(optimized_model_path):
+        logger.debug("Loading optimized model: {!r}".format(optimized_model_path))
+        sess_options.graph_optimization_level = get_level("disable")
+        try:
+            return onnxruntime.InferenceSession(
+                optimized_model_path, sess_options=sess_options, providers=providers
+            )
+        except Exception as e:
+            logger.warning("Failed to load optimized model: {}".format(e))
+            sess_options.graph_optimization_level = get_level(graph_optimization_level)
+
+    # saved to a temporary file and renamed, since it may be loaded by others
+    tmp_path = "{}.{}.tmp".format(optimized_model_path, uuid.uuid4().hex)
+    try:
+        os.makedirs(optimized_model_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning("Failed to create optimized model directory: {}".format(e))
+    else:
+        sess_options.optimized_model_filepath = tmp_path
+    session = onnxruntime.InferenceSession(
+        model_path, sess_options=sess_options, providers=providers
+    )
+    if osp.exists(tmp_path):
+        try:
+            os.replace(tmp_path, optimized_model_path)
+        except OSError as e:
+            logger.warning("Failed to save optimized model: {}".format(e))
+            os.remove(tmp_path)
+    return session
+
+
+def _get_optimized_model_path(
+    optimized_model_dir, model_path, providers, graph_optimization_level
+):
+    import onnxruntime
+
+    # optimized graphs depend on the model, the level and the hardware
+    stat = os.stat(model_path)
+    key = repr(
+        (
+            osp.abspath(model_path),
+            stat.st_size,
+            stat.st_mtime,
+            providers,
+            graph_optimization_level,
+            onnxruntime.__version__,
+        )
+    )
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    stem = osp.splitext(osp.basename(model_path))[0]
+    return osp.join(optimized_model_dir, "{}.{}.onnx".format(stem, digest))
@@ -0,0 +1,126 @@
+import collections
+
+import numpy as np
+
+
+def get_tile_size(image, tile_size, min_image_size):
+    """Return the tile size to encode the image with, or None not to tile it."""
+    if tile_size is None or max(image.shape[:2]) <= min_image_size:
+        return None
+    return tile_size
+
+
+def _get_tile_start(min_value, max_value, size, tile_size):
+    if size <= tile_size:
+        return 0
+    # tiles overlap by half, and nearby prompts share the tile on the grid
+    stride = tile_size // 2
+    center = (min_value + max_value) / 2
+    start = int(round((center - stride) / stride)) * stride
+    start = min(max(start, 0), size - tile_size)
+    if start <= min_value and max_value < start + tile_size:
+        return start
+    return min(max(int(center - tile_size / 2), 0), size - tile_size)
+
+
+def get_tile(image_shape, points, tile_size):
+    """Return (x1, y1, x2, y2) of the tile that contains the points.
+
+    None is returned if the points are too far apart to fit in a tile.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+    if x_max - x_min >= tile_size or y_max - y_min >= tile_size:
+        return None
+    height, width = image_shape[:2]
+    x1 = _get_tile_start(x_min, x_max, size=width, tile_size=tile_size)
+    y1 = _get_tile_start(y_min, y_max, size=height, tile_size=tile_size)
+    return x1, y1, min(x1 + tile_size, width), min(y1 + tile_size, height)
+
+
+def _touches_inner_border(mask, tile, image_shape):
+    """Return whether a mask in the tile touches a border inside the image."""
+    x1, y1, x2, y2 = tile
+    height, width = image_shape[:2]
+    return bool(
+        (x1 > 0 and mask[:, 0].any())
+        or (y1 > 0 and mask[0, :].any())
+        or (x2 < width and mask[:, -1].any())
+        or (y2 < height and mask[-1, :].any())
+    )
+
+
+def predict_masks(
+    image,
+    points_list,
+    point_labels_list,
+    tile_size,
+    get_image_embedding,
+    get_tile_embedding,
+    compute_masks,
+):
+    """Predict masks with the embeddings of the tiles around the prompts.
+
+    Prompts that do not fit in a tile, and prompts whose masks in the tile are
+    cut off at a border of the tile inside the image, are predicted with the
+    embedding of the whole image. A list of (mask, (x, y)) is returned, where
+    (x, y) is the offset of the mask in the image.
+    """
+    if len(points_list) != len(point_labels_list):
+        raise ValueError("points_list and point_labels_list must have the same length")
+
+    def _compute_masks(indices, tile_image, image_embedding, x1, y1):
+        return compute_masks(
+            image=tile_image,
+            image_embedding=image_embedding,
+            points_list=[
+                np.asarray(points_list[i], dtype=float).reshape(-1, 2) - (x1, y1)
+                for i in indices
+            ],
+            point_labels_list=[point_labels_list[i] for i in indices],
+        )
+
+    prompt_indices = collections.defaultdict(list)  # tile -> indices
+    for i, points in enumerate(points_list):
+        tile = None if tile_size is None else get_tile(image.shape, points, tile_size)
+        prompt_indices[tile].append(i)
+
+    masks_with_offsets = [None] * len(points_list)
+    whole_image_indices = prompt_indices.pop(None, [])
+    for tile, indices in prompt_indices.items():
+        x1, y1, x2, y2 = tile
+        masks = _compute_masks(
+            indices,
+            tile_image=image[y1:y2, x1:x2],
+            image_embedding=get_tile_embedding(tile),
+            x1=x1,
+            y1=y1,
+        )
+        for i, mask in zip(indices, masks):
+            if _touches_inner_border(mask, tile=tile, image_shape=image.shape):
+                whole_image_indices.append(i)
+            else:
+                masks_with_offsets[i] = (mask, (x1, y1))
+
+    if whole_image_indices:
+        whole_image_indices.sort()
+        masks = _compute_masks(
+            whole_image_indices,
+            tile_image=image,
+            image_embedding=get_image_embedding(),
+            x1=0,
+            y1=0,
+        )
+        for i, mask in zip(whole_image_indices, masks):
+            masks_with_offsets[i] = (mask, (0, 0))
+    return masks_with_offsets
+
+
+def paste_mask(mask, offset, image_shape):
+    """Paste a mask at the offset into a mask of the image size."""
+    if mask.shape == tuple(image_shape[:2]):
+        return mask
+    x1, y1 = offset
+    full_mask = np.zeros(image_shape[:2], dtype=bool)
+    full_mask[y1 : y1 + mask.shape[0], x1 : x1 + mask.shape[1]] = mask
+    return full_mask
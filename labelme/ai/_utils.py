@@ -1,9 +1,16 @@
+import hashlib
+
 import imgviz
 import numpy as np
 import skimage
 
 from labelme.logger import logger
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 
 def _get_contour_length(contour):
     contour_start = contour
@@ -12,10 +19,21 @@ def _get_contour_length(contour):
 
 
 def compute_polygon_from_mask(mask):
-    contours = skimage.measure.find_contours(np.pad(mask, pad_width=1))
-    if len(contours) == 0:
+    # the contours are found in the bounding box of the mask, which is usually
+    # much smaller than the image, e.g., for masks of boxes
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
         logger.warning("No contour found, so returning empty polygon.")
         return np.empty((0, 2), dtype=np.float32)
+    y1, y2, x1, x2 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+    contours = [
+        contour + (y1, x1)
+        for contour in skimage.measure.find_contours(
+            np.pad(mask[y1:y2, x1:x2], pad_width=1)
+        )
+    ]
 
     contour = max(contours, key=_get_contour_length)
     POLYGON_APPROX_TOLERANCE = 0.004
@@ -36,3 +54,36 @@ def compute_polygon_from_mask(mask):
         imgviz.io.imsave("contour.jpg", np.asarray(image_pil))
 
     return polygon[:, ::-1]  # yx -> xy
+
+
+def postprocess_mask(mask):
+    """Binarize logits of a decoder and remove small objects from it."""
+    mask = mask > 0.0
+
+    MIN_SIZE_RATIO = 0.05
+    skimage.morphology.remove_small_objects(
+        mask, min_size=mask.sum() * MIN_SIZE_RATIO, out=mask
+    )
+    return mask
+
+
+def is_input_dim_dynamic(session, name, axis):
+    """Return whether a dimension of an input of an onnxruntime session is dynamic."""
+    (input,) = [input for input in session.get_inputs() if input.name == name]
+    return not isinstance(input.shape[axis], int)
+
+
+def compute_image_hash(image):
+    """Return a hex digest of the content, shape and dtype of an image.
+
+    The buffer of the image is hashed without being copied, with xxhash if
+    installed and otherwise sha256, which is hardware accelerated on most CPUs.
+    """
+    image = np.ascontiguousarray(image)
+    if xxhash is None:
+        hash = hashlib.sha256()
+    else:
+        hash = xxhash.xxh3_128()
+    hash.update("{}{}".format(image.shape, image.dtype).encode("utf-8"))
+    hash.update(image)
+    return hash.hexdigest()
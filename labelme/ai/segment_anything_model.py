@@ -1,73 +1,31 @@
-import collections
-import threading
-
 import imgviz
 import numpy as np
-import onnxruntime
-import skimage
 
-from ..logger import logger
 from . import _utils
+from ._image_embedding_model import ImageEmbeddingModel
 
 
-class SegmentAnythingModel:
-    def __init__(self, encoder_path, decoder_path):
+class SegmentAnythingModel(ImageEmbeddingModel):
+    def __init__(self, encoder_path, decoder_path, **kwargs):
         self._image_size = 1024
+        super().__init__(encoder_path=encoder_path, decoder_path=decoder_path, **kwargs)
 
-        self._encoder_session = onnxruntime.InferenceSession(encoder_path)
-        self._decoder_session = onnxruntime.InferenceSession(decoder_path)
-
-        self._lock = threading.Lock()
-        self._image_embedding_cache = collections.OrderedDict()
-
-        self._thread = None
-
-    def set_image(self, image: np.ndarray):
-        with self._lock:
-            self._image = image
-            self._image_embedding = self._image_embedding_cache.get(
-                self._image.tobytes()
-            )
-
-        if self._image_embedding is None:
-            self._thread = threading.Thread(
-                target=self._compute_and_cache_image_embedding
-            )
-            self._thread.start()
-
-    def _compute_and_cache_image_embedding(self):
-        with self._lock:
-            logger.debug("Computing image embedding...")
-            self._image_embedding = _compute_image_embedding(
-                image_size=self._image_size,
-                encoder_session=self._encoder_session,
-                image=self._image,
-            )
-            if len(self._image_embedding_cache) > 10:
-                self._image_embedding_cache.popitem(last=False)
-            self._image_embedding_cache[self._image.tobytes()] = self._image_embedding
-            logger.debug("Done computing image embedding.")
-
-    def _get_image_embedding(self):
-        if self._thread is not None:
-            self._thread.join()
-            self._thread = None
-        with self._lock:
-            return self._image_embedding
-
-    def predict_mask_from_points(self, points, point_labels):
-        return _compute_mask_from_points(
+    def _encode_image(self, image):
+        return _compute_image_embedding(
             image_size=self._image_size,
-            decoder_session=self._decoder_session,
-            image=self._image,
-            image_embedding=self._get_image_embedding(),
-            points=points,
-            point_labels=point_labels,
+            encoder_session=self._encoder_session,
+            image=image,
         )
 
-    def predict_polygon_from_points(self, points, point_labels):
-        mask = self.predict_mask_from_points(points=points, point_labels=point_labels)
-        return _utils.compute_polygon_from_mask(mask=mask)
+    def _compute_masks(self, image, image_embedding, points_list, point_labels_list):
+        return _compute_masks_from_points(
+            image_size=self._image_size,
+            decoder_session=self._decoder_session,
+            image=image,
+            image_embedding=image_embedding,
+            points_list=points_list,
+            point_labels_list=point_labels_list,
+        )
 
 
 def _compute_scale_to_resize_image(image_size, image):
@@ -119,48 +77,61 @@ def _compute_image_embedding(image_size, encoder_session, image):
     return image_embedding
 
 
-def _compute_mask_from_points(
-    image_size, decoder_session, image, image_embedding, points, point_labels
+def _compute_masks_from_points(
+    image_size, decoder_session, image, image_embedding, points_list, point_labels_list
 ):
-    input_point = np.array(points, dtype=np.float32)
-    input_label = np.array(point_labels, dtype=np.int32)
-
-    onnx_coord = np.concatenate([input_point, np.array([[0.0, 0.0]])], axis=0)[
-        None, :, :
-    ]
-    onnx_label = np.concatenate([input_label, np.array([-1])], axis=0)[None, :].astype(
-        np.float32
-    )
+    if len(points_list) != len(point_labels_list):
+        raise ValueError("points_list and point_labels_list must have the same length")
+    if len(points_list) == 0:
+        return []
 
     scale, new_height, new_width = _compute_scale_to_resize_image(
         image_size=image_size, image=image
     )
-    onnx_coord = (
-        onnx_coord.astype(float)
-        * (new_width / image.shape[1], new_height / image.shape[0])
-    ).astype(np.float32)
-
-    onnx_mask_input = np.zeros((1, 1, 256, 256), dtype=np.float32)
-    onnx_has_mask_input = np.array([-1], dtype=np.float32)
-
-    decoder_inputs = {
-        "image_embeddings": image_embedding,
-        "point_coords": onnx_coord,
-        "point_labels": onnx_label,
-        "mask_input": onnx_mask_input,
-        "has_mask_input": onnx_has_mask_input,
-        "orig_im_size": np.array(image.shape[:2], dtype=np.float32),
-    }
-
-    masks, _, _ = decoder_session.run(None, decoder_inputs)
-    mask = masks[0, 0]  # (1, 1, H, W) -> (H, W)
-    mask = mask > 0.0
-
-    MIN_SIZE_RATIO = 0.05
-    skimage.morphology.remove_small_objects(
-        mask, min_size=mask.sum() * MIN_SIZE_RATIO, out=mask
-    )
 
-    if 0:
-        imgviz.io.imsave("mask.jpg", imgviz.label2rgb(mask, imgviz.rgb2gray(image)))
-    return mask
+    onnx_coords = []
+    onnx_labels = []
+    for points, point_labels in zip(points_list, point_labels_list):
+        input_point = np.array(points, dtype=np.float32).reshape(-1, 2)
+        input_label = np.array(point_labels, dtype=np.int32)
+
+        # the padding point of the label -1
+        onnx_coord = np.concatenate([input_point, np.array([[0.0, 0.0]])], axis=0)
+        onnx_label = np.concatenate([input_label, np.array([-1])], axis=0)
+        onnx_coords.append(
+            (
+                onnx_coord.astype(float)
+                * (new_width / image.shape[1], new_height / image.shape[0])
+            ).astype(np.float32)
+        )
+        onnx_labels.append(onnx_label.astype(np.float32))
+
+    if _utils.is_input_dim_dynamic(decoder_session, name="point_coords", axis=0):
+        # pad the prompts to the same number of points to run them at once
+        num_points = max(len(onnx_coord) for onnx_coord in onnx_coords)
+        batched_coord = np.zeros((len(onnx_coords), num_points, 2), dtype=np.float32)
+        batched_label = np.full((len(onnx_labels), num_points), -1, dtype=np.float32)
+        for i, (onnx_coord, onnx_label) in enumerate(zip(onnx_coords, onnx_labels)):
+            batched_coord[i, : len(onnx_coord)] = onnx_coord
+            batched_label[i, : len(onnx_label)] = onnx_label
+        batches = [(batched_coord, batched_label)]
+    else:
+        batches = [
+            (onnx_coord[None], onnx_label[None])
+            for onnx_coord, onnx_label in zip(onnx_coords, onnx_labels)
+        ]
+
+    masks = []
+    for batched_coord, batched_label in batches:
+        decoder_inputs = {
+            "image_embeddings": image_embedding,
+            "point_coords": batched_coord,
+            "point_labels": batched_label,
+            "mask_input": np.zeros((len(batched_coord), 1, 256, 256), dtype=np.float32),
+            "has_mask_input": np.array([-1], dtype=np.float32),
+            "orig_im_size": np.array(image.shape[:2], dtype=np.float32),
+        }
+        batched_masks, _, _ = decoder_session.run(None, decoder_inputs)
+        masks.extend(batched_masks[:, 0])  # (N, 1, H, W) -> N x (H, W)
+
+    return [_utils.postprocess_mask(mask) for mask in masks]
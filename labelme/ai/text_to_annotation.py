@@ -1,15 +1,20 @@
 import json
 import time
+from typing import Optional
 
+import imgviz
 import numpy as np
-import osam
 
 from labelme.logger import logger
 
+from ._utils import compute_polygon_from_mask
+
 
 def get_rectangles_from_texts(
     model: str, image: np.ndarray, texts: list[str]
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    import osam
+
     request: osam.types.GenerateRequest = osam.types.GenerateRequest(
         model=model,
         image=image,
@@ -57,6 +62,8 @@ def non_maximum_suppression(
     score_threshold: float,
     max_num_detections: int,
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    import osam
+
     num_classes = np.max(labels) + 1
     scores_of_all_classes = np.zeros((len(boxes), num_classes), dtype=np.float32)
     for i, (score, label) in enumerate(zip(scores, labels)):
@@ -73,20 +80,58 @@ def non_maximum_suppression(
     return boxes, scores, labels
 
 
+def get_box_prompts(boxes: np.ndarray) -> tuple[list, list]:
+    """Return points and point labels of boxes for predict_masks_from_prompts."""
+    points_list: list = [
+        [[xmin, ymin], [xmax, ymax]] for xmin, ymin, xmax, ymax in boxes.tolist()
+    ]
+    point_labels_list: list = [[2, 3]] * len(boxes)
+    return points_list, point_labels_list
+
+
 def get_shapes_from_annotations(
-    boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray, texts: list[str]
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    labels: np.ndarray,
+    texts: list[str],
+    masks: Optional[list[np.ndarray]] = None,
+    shape_type: str = "rectangle",
 ) -> list[dict]:
+    if shape_type not in ["rectangle", "polygon", "mask"]:
+        raise ValueError(f"Unsupported shape_type: {shape_type!r}")
+    if shape_type != "rectangle" and masks is None:
+        raise ValueError(f"masks are required for shape_type={shape_type!r}")
+
     shapes: list[dict] = []
-    for box, score, label in zip(boxes.tolist(), scores.tolist(), labels.tolist()):
+    for i, (box, score, label) in enumerate(
+        zip(boxes.tolist(), scores.tolist(), labels.tolist())
+    ):
         text = texts[label]
-        xmin, ymin, xmax, ymax = box
+        mask = None
+        if shape_type == "rectangle":
+            xmin, ymin, xmax, ymax = box
+            points = [[xmin, ymin], [xmax, ymax]]
+        elif shape_type == "polygon":
+            points = compute_polygon_from_mask(mask=masks[i]).tolist()
+            if len(points) < 3:
+                logger.warning(f"Skipping a box without polygon: box={box}")
+                continue
+        else:
+            if not masks[i].any():
+                logger.warning(f"Skipping a box without mask: box={box}")
+                continue
+            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([masks[i]])[0]
+            y1, x1, y2, x2 = int(y1), int(x1), int(y2), int(x2)
+            points = [[x1, y1], [x2, y2]]
+            mask = masks[i][y1 : y2 + 1, x1 : x2 + 1]
         shape = {
             "label": text,
-            "points": [[xmin, ymin], [xmax, ymax]],
+            "points": points,
             "group_id": None,
-            "shape_type": "rectangle",
+            "shape_type": shape_type,
             "flags": {},
             "description": json.dumps(dict(score=score, text=text)),
+            "mask": mask,
         }
         shapes.append(shape)
     return shapes
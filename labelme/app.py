@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import functools
 import html
 import math
@@ -7,10 +8,12 @@ import os
 import os.path as osp
 import re
 import webbrowser
+from typing import Optional
 
 import imgviz
 import natsort
 import numpy as np
+import PIL.Image
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -19,6 +22,9 @@ from qtpy.QtCore import Qt
 from labelme import PY2
 from labelme import __appname__
 from labelme import ai
+from labelme._autosave import AutoSaver
+from labelme._prefetch import EmbeddingPrefetcher
+from labelme._prefetch import load_image_array
 from labelme.ai import MODELS
 from labelme.config import get_config
 from labelme.label_file import LabelFile
@@ -94,6 +100,13 @@ class MainWindow(QtWidgets.QMainWindow):
         # Whether we need to save or not.
         self.dirty = False
 
+        self._autoSaver = AutoSaver(parent=self)
+        self._autoSaver.saveFailed.connect(self._onAutoSaveFailed)
+
+        self._embeddingPrefetcher = EmbeddingPrefetcher(
+            max_workers=self._config["ai"]["prefetch"]["max_workers"]
+        )
+
         self._noSelectionSlot = False
 
         self._copied_shapes = None
@@ -169,6 +182,8 @@ class MainWindow(QtWidgets.QMainWindow):
             double_click=self._config["canvas"]["double_click"],
             num_backups=self._config["canvas"]["num_backups"],
             crosshair=self._config["canvas"]["crosshair"],
+            ai_model_kwargs=ai.get_model_kwargs(self._config["ai"]),
+            ai_model_client_kwargs=self._getAiModelClientKwargs(),
         )
         self.canvas.zoomRequest.connect(self.zoomRequest)
         self.canvas.mouseMoved.connect(
@@ -375,9 +390,7 @@ class MainWindow(QtWidgets.QMainWindow):
             enabled=False,
         )
         createAiPolygonMode.changed.connect(
-            lambda: self.canvas.initializeAiModel(
-                name=self._selectAiModelComboBox.currentText()
-            )
+            lambda: self._initializeAiModel()
             if self.canvas.createMode == "ai_polygon"
             else None
         )
@@ -390,9 +403,7 @@ class MainWindow(QtWidgets.QMainWindow):
             enabled=False,
         )
         createAiMaskMode.changed.connect(
-            lambda: self.canvas.initializeAiModel(
-                name=self._selectAiModelComboBox.currentText()
-            )
+            lambda: self._initializeAiModel()
             if self.canvas.createMode == "ai_mask"
             else None
         )
@@ -804,9 +815,7 @@ class MainWindow(QtWidgets.QMainWindow):
             model_index = 0
         self._selectAiModelComboBox.setCurrentIndex(model_index)
         self._selectAiModelComboBox.currentIndexChanged.connect(
-            lambda: self.canvas.initializeAiModel(
-                name=self._selectAiModelComboBox.currentText()
-            )
+            lambda: self._initializeAiModel()
             if self.canvas.createMode in ["ai_polygon", "ai_mask"]
             else None
         )
@@ -855,10 +864,15 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Application state.
         self.image = QtGui.QImage()
+        # decoded RGBA buffer viewed by self.image, the brightness/contrast
+        # dialog and AI models, so it must be kept alive together with self.image
+        self._image_arr = None
         self.imagePath = None
         self.recentFiles = []
         self.maxRecent = 7
         self.otherData = None
+        # (imageData, base64 of it), since the same image is saved repeatedly
+        self._imageDataB64 = None
         self.zoom_level = 100
         self.fit_window = False
         self.zoom_values = {}  # key=filename, value=(zoom_mode, zoom_value)
@@ -956,7 +970,7 @@ class MainWindow(QtWidgets.QMainWindow):
             if self.output_dir:
                 label_file_without_path = osp.basename(label_file)
                 label_file = osp.join(self.output_dir, label_file_without_path)
-            self.saveLabels(label_file)
+            self.saveLabels(label_file, background=True)
             return
         self.dirty = True
         self.actions.save.setEnabled(True)
@@ -1003,7 +1017,7 @@ class MainWindow(QtWidgets.QMainWindow):
         texts = self._ai_prompt_widget.get_text_prompt().split(",")
         boxes, scores, labels = ai.get_rectangles_from_texts(
             model="yoloworld",
-            image=utils.img_qt_to_arr(self.image)[:, :, :3],
+            image=self._image_arr[:, :, :3],
             texts=texts,
         )
 
@@ -1037,11 +1051,24 @@ class MainWindow(QtWidgets.QMainWindow):
         scores = scores[keep]
         labels = labels[keep]
 
+        shape_type: str = self._ai_prompt_widget.get_shape_type()
+        masks: Optional[list[np.ndarray]] = None
+        if shape_type != "rectangle":
+            # the boxes are prompts of one batched decoder run, which reuses the
+            # image embedding of the current image
+            self._initializeAiModel()
+            points_list, point_labels_list = ai.get_box_prompts(boxes=boxes)
+            masks = self.canvas.aiModel().predict_masks_from_prompts(
+                points_list=points_list, point_labels_list=point_labels_list
+            )
+
         shape_dicts: list[dict] = ai.get_shapes_from_annotations(
             boxes=boxes,
             scores=scores,
             labels=labels,
             texts=texts,
+            masks=masks,
+            shape_type=shape_type,
         )
 
         shapes: list[Shape] = []
@@ -1050,9 +1077,11 @@ class MainWindow(QtWidgets.QMainWindow):
                 label=shape_dict["label"],
                 shape_type=shape_dict["shape_type"],
                 description=shape_dict["description"],
+                mask=shape_dict["mask"],
             )
             for point in shape_dict["points"]:
                 shape.addPoint(QtCore.QPointF(*point))
+            shape.close()
             shapes.append(shape)
 
         self.canvas.storeShapes()
@@ -1064,6 +1093,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.filename = None
         self.imagePath = None
         self.imageData = None
+        self._imageDataB64 = None
         self.labelFile = None
         self.otherData = None
         self.canvas.resetState()
@@ -1413,11 +1443,13 @@ class MainWindow(QtWidgets.QMainWindow):
             item.setCheckState(Qt.Checked if flag else Qt.Unchecked)
             self.flag_widget.addItem(item)
 
-    def saveLabels(self, filename):
+    def saveLabels(self, filename, background=False):
         lf = LabelFile()
 
+        # flags and other_data are copied, since they may be mutated while the
+        # label file is being saved in background
         def format_shape(s):
-            data = s.other_data.copy()
+            data = copy.deepcopy(s.other_data)
             data.update(
                 dict(
                     label=s.label.encode("utf-8") if PY2 else s.label,
@@ -1425,15 +1457,16 @@ class MainWindow(QtWidgets.QMainWindow):
                     group_id=s.group_id,
                     description=s.description,
                     shape_type=s.shape_type,
-                    flags=s.flags,
+                    flags=copy.deepcopy(s.flags),
                     mask=None
                     if s.mask is None
-                    else utils.img_arr_to_b64(s.mask.astype(np.uint8)),
+                    else LabelFile.encode_mask(s.mask, self._config["mask_encoding"]),
                 )
             )
             return data
 
-        shapes = [format_shape(item.shape()) for item in self.labelList]
+        # the serialized shapes are cached, so only the mutated ones are encoded
+        shapes = [item.shape().getSerialized(format_shape) for item in self.labelList]
         flags = {}
         for i in range(self.flag_widget.count()):
             item = self.flag_widget.item(i)
@@ -1445,16 +1478,25 @@ class MainWindow(QtWidgets.QMainWindow):
             imageData = self.imageData if self._config["store_data"] else None
             if osp.dirname(filename) and not osp.exists(osp.dirname(filename)):
                 os.makedirs(osp.dirname(filename))
-            lf.save(
+            save = functools.partial(
+                self._saveLabelFile,
+                lf,
                 filename=filename,
                 shapes=shapes,
                 imagePath=imagePath,
                 imageData=imageData,
                 imageHeight=self.image.height(),
                 imageWidth=self.image.width(),
-                otherData=self.otherData,
+                otherData=copy.deepcopy(self.otherData),
                 flags=flags,
             )
+            if background:
+                lf.filename = filename
+                self._autoSaver.request(filename, save)
+            else:
+                # pending auto saves are older, so they must not overwrite this
+                self._autoSaver.flush()
+                save()
             self.labelFile = lf
             items = self.fileListWidget.findItems(self.imagePath, Qt.MatchExactly)
             if len(items) > 0:
@@ -1470,6 +1512,75 @@ class MainWindow(QtWidgets.QMainWindow):
             )
             return False
 
+    def _saveLabelFile(self, lf, filename, imageData, **kwargs):
+        # called in background, so the base64 of the image data is computed
+        # here and kept for the next saves of the same image
+        imageDataB64 = None
+        if imageData is not None and not LabelFile.is_binary_label_file(filename):
+            cache = self._imageDataB64
+            if cache is not None and cache[0] is imageData:
+                imageDataB64 = cache[1]
+            else:
+                imageDataB64 = LabelFile.encode_image_data(imageData)
+                self._imageDataB64 = (imageData, imageDataB64)
+        lf.save(
+            filename=filename,
+            imageData=imageData,
+            imageDataB64=imageDataB64,
+            **kwargs,
+        )
+
+    def _getAiModelClientKwargs(self):
+        server_config = ai.get_server_config(self._config["ai"])
+        if not server_config["enabled"]:
+            return None
+        try:
+            authkey = ai.read_authkey(server_config["authkey_file"])
+        except OSError as e:
+            logger.warning(
+                "Failed to read the key of the AI model server: {}".format(e)
+            )
+            return None
+        return dict(address=server_config["address"], authkey=authkey)
+
+    def _initializeAiModel(self):
+        self.canvas.initializeAiModel(name=self._selectAiModelComboBox.currentText())
+        self._prefetchAiImageEmbeddings()
+
+    def _prefetchAiImageEmbeddings(self):
+        # encode the next images while the current one is annotated
+        model = self.canvas.aiModel()
+        if model is None or self.filename not in self.imageList:
+            self._embeddingPrefetcher.cancel()
+            return
+        index = self.imageList.index(self.filename)
+        num_images = self._config["ai"]["prefetch"]["num_images"]
+        image_loaders = []
+        for filename in self.imageList[index + 1 : index + 1 + num_images]:
+            label_file = self._getLabelFile(filename)
+            if not (
+                QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file)
+            ):
+                label_file = None
+            image_loaders.append(
+                functools.partial(load_image_array, filename, label_file=label_file)
+            )
+        self._embeddingPrefetcher.prefetch(model, image_loaders)
+
+    def _getLabelFile(self, filename):
+        # assumes same name, but json extension
+        label_file = osp.splitext(filename)[0] + ".json"
+        if self.output_dir:
+            label_file_without_path = osp.basename(label_file)
+            label_file = osp.join(self.output_dir, label_file_without_path)
+        return label_file
+
+    def _onAutoSaveFailed(self, filename, message):
+        # bound method, so that it is queued to the GUI thread
+        self.errorMessage(
+            self.tr("Error saving label data"), self.tr("<b>%s</b>") % message
+        )
+
     def duplicateSelectedShape(self):
         self.copySelectedShape()
         self.pasteSelectedShape()
@@ -1613,7 +1724,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def brightnessContrast(self, value):
         dialog = BrightnessContrastDialog(
-            utils.img_data_to_pil(self.imageData),
+            PIL.Image.fromarray(self._image_arr),
             self.onNewBrightnessContrast,
             parent=self,
         )
@@ -1647,6 +1758,8 @@ class MainWindow(QtWidgets.QMainWindow):
             self.fileListWidget.repaint()
             return
 
+        # the label file to load may be still being auto saved
+        self._autoSaver.flush()
         self.resetState()
         self.canvas.setEnabled(False)
         if filename is None:
@@ -1658,12 +1771,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.tr("No such file: <b>%s</b>") % filename,
             )
             return False
-        # assumes same name, but json extension
         self.status(str(self.tr("Loading %s...")) % osp.basename(str(filename)))
-        label_file = osp.splitext(filename)[0] + ".json"
-        if self.output_dir:
-            label_file_without_path = osp.basename(label_file)
-            label_file = osp.join(self.output_dir, label_file_without_path)
+        label_file = self._getLabelFile(filename)
         if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
             try:
                 self.labelFile = LabelFile(label_file)
@@ -1705,11 +1814,15 @@ class MainWindow(QtWidgets.QMainWindow):
             )
             self.status(self.tr("Error reading %s") % filename)
             return False
-        self.image = image
+        # decode once into a buffer which is shared without copying
+        self._image_arr = utils.img_qt_to_arr(image)
+        self.image = utils.img_arr_to_qt(self._image_arr)
         self.filename = filename
         if self._config["keep_prev"]:
             prev_shapes = self.canvas.shapes
-        self.canvas.loadPixmap(QtGui.QPixmap.fromImage(image))
+        self.canvas.loadPixmap(
+            QtGui.QPixmap.fromImage(self.image), image_arr=self._image_arr
+        )
         flags = {k: False for k in self._config["flags"] or []}
         if self.labelFile:
             self.loadLabels(self.labelFile.shapes)
@@ -1737,7 +1850,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 )
         # set brightness contrast values
         dialog = BrightnessContrastDialog(
-            utils.img_data_to_pil(self.imageData),
+            PIL.Image.fromarray(self._image_arr),
             self.onNewBrightnessContrast,
             parent=self,
         )
@@ -1764,6 +1877,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.toggleActions(True)
         self.canvas.setFocus()
         self.status(str(self.tr("Loaded %s")) % osp.basename(str(filename)))
+        self._prefetchAiImageEmbeddings()
         return True
 
     def resizeEvent(self, event):
@@ -1811,6 +1925,11 @@ class MainWindow(QtWidgets.QMainWindow):
     def closeEvent(self, event):
         if not self.mayContinue():
             event.ignore()
+        self._autoSaver.flush()
+        if event.isAccepted():
+            self._embeddingPrefetcher.shutdown()
+        else:
+            self._embeddingPrefetcher.cancel()
         self.settings.setValue("filename", self.filename if self.filename else "")
         self.settings.setValue("window/size", self.size())
         self.settings.setValue("window/position", self.pos())
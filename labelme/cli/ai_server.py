@@ -0,0 +1,60 @@
+import argparse
+import os
+import os.path as osp
+
+from labelme import ai
+from labelme.config import get_config
+from labelme.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve AI models to labelme instances with ai.server enabled."
+    )
+    default_config_file = osp.join(osp.expanduser("~"), ".labelmerc")
+    parser.add_argument(
+        "--config",
+        default=default_config_file,
+        help="config file or yaml-format string (default: {})".format(
+            default_config_file
+        ),
+    )
+    parser.add_argument(
+        "--address",
+        help="socket to listen on (default: ai.server.address of the config)",
+    )
+    parser.add_argument(
+        "--authkey-file",
+        help="key to authenticate clients, created if missing "
+        "(default: ai.server.authkey_file of the config)",
+    )
+    args = parser.parse_args()
+
+    config_file_or_yaml = args.config
+    if config_file_or_yaml == default_config_file and not osp.exists(
+        default_config_file
+    ):
+        config_file_or_yaml = None
+    config = get_config(config_file_or_yaml)
+
+    server_config = ai.get_server_config(config["ai"])
+    address = args.address or server_config["address"]
+    authkey_file = args.authkey_file or server_config["authkey_file"]
+    if osp.dirname(address):
+        os.makedirs(osp.dirname(address), exist_ok=True)
+
+    authkey = ai.read_authkey(authkey_file, create=True)
+    logger.info("Using the key file: {!r}".format(authkey_file))
+    try:
+        ai.serve(
+            address=address,
+            authkey=authkey,
+            models=ai.MODELS,
+            model_kwargs=ai.get_model_kwargs(config["ai"]),
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
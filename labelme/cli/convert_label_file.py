@@ -0,0 +1,87 @@
+import argparse
+import os.path as osp
+
+from labelme.label_file import LabelFile
+from labelme.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a label file between JSON ({}) and binary ({}).".format(
+            LabelFile.suffix, LabelFile.binary_suffix
+        )
+    )
+    parser.add_argument("in_file", help="input label file")
+    parser.add_argument(
+        "-o",
+        "--out",
+        default=None,
+        help="output label file (default: input file with the other suffix)",
+    )
+    parser.add_argument(
+        "--data",
+        dest="store_data",
+        action="store_true",
+        default=None,
+        help="store image data to the output file "
+        "(default: only if the input file stores it)",
+    )
+    parser.add_argument(
+        "--nodata",
+        dest="store_data",
+        action="store_false",
+        help="stop storing image data to the output file",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="write JSON without indentation",
+    )
+    parser.add_argument(
+        "--mask-encoding",
+        choices=LabelFile.mask_encodings,
+        default="png",
+        help="encoding of masks in JSON (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if not LabelFile.is_label_file(args.in_file):
+        parser.error("Unsupported label file: {}".format(args.in_file))
+
+    out_file = args.out
+    if out_file is None:
+        if LabelFile.is_binary_label_file(args.in_file):
+            out_file = args.in_file[: -len(LabelFile.binary_suffix)] + LabelFile.suffix
+        else:
+            out_file = osp.splitext(args.in_file)[0] + LabelFile.binary_suffix
+
+    # image data is loaded only when it is stored
+    label_file = LabelFile(args.in_file, lazy=True)
+    store_data = args.store_data
+    if store_data is None:
+        store_data = label_file.hasImageData
+
+    shapes = []
+    for shape in label_file.shapes:
+        data = shape["other_data"].copy()
+        data.update({k: v for k, v in shape.items() if k != "other_data"})
+        shapes.append(data)
+
+    imageData = label_file.imageData if store_data else None
+    LabelFile().save(
+        filename=out_file,
+        shapes=shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        imageData=imageData,
+        otherData=label_file.otherData,
+        flags=label_file.flags,
+        compact=args.compact,
+        mask_encoding=args.mask_encoding,
+    )
+    logger.info("Saved to: {}".format(out_file))
+
+
+if __name__ == "__main__":
+    main()
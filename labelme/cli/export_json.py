@@ -1,12 +1,12 @@
 import argparse
 import base64
-import json
 import os
 import os.path as osp
 
 import imgviz
 import PIL.Image
 
+from labelme import _json
 from labelme import utils
 from labelme.logger import logger
 
@@ -27,7 +27,8 @@ def main():
     if not osp.exists(out_dir):
         os.mkdir(out_dir)
 
-    data = json.load(open(json_file))
+    with open(json_file, "rb") as f:
+        data = _json.load(f)
     imageData = data.get("imageData")
 
     if not imageData:
@@ -49,6 +49,21 @@ def validate_config_item(key, value):
         raise ValueError(
             "Unexpected value for config key 'shape_color': {}".format(value)
         )
+    if key == "mask_encoding" and value not in ["png", "rle"]:
+        raise ValueError(
+            "Unexpected value for config key 'mask_encoding': {}".format(value)
+        )
+    if key == "graph_optimization_level" and value not in [
+        "disable",
+        "basic",
+        "extended",
+        "all",
+    ]:
+        raise ValueError(
+            "Unexpected value for config key 'graph_optimization_level': {}".format(
+                value
+            )
+        )
     if key == "labels" and value is not None and len(value) != len(set(value)):
         raise ValueError(
             "Duplicates are detected for config key 'labels': {}".format(value)
@@ -1,15 +1,21 @@
 import base64
 import contextlib
+import functools
 import io
-import json
+import os
 import os.path as osp
+import uuid
 
+import numpy as np
 import PIL.Image
 
 from labelme import PY2
 from labelme import QT4
 from labelme import __version__
+from labelme import _json
+from labelme import _label_file_binary
 from labelme import utils
+from labelme._json_stream import JsonStreamReader
 from labelme.logger import logger
 
 PIL.Image.MAX_IMAGE_PIXELS = None
@@ -31,17 +37,71 @@ class LabelFileError(Exception):
     pass
 
 
+class _LazyMaskShape(dict):
+    # shape dict whose encoded mask is decoded on the first access of the values
+
+    def _decode_mask(self):
+        mask = super(_LazyMaskShape, self).get("mask")
+        if isinstance(mask, (str, dict)):
+            self["mask"] = LabelFile.decode_mask(mask)
+
+    def __getitem__(self, key):
+        if key == "mask":
+            self._decode_mask()
+        return super(_LazyMaskShape, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        # overriding __iter__ makes dict(shape) and **shape use __getitem__
+        # instead of copying the values of the dict directly
+        return super(_LazyMaskShape, self).__iter__()
+
+    def items(self):
+        self._decode_mask()
+        return super(_LazyMaskShape, self).items()
+
+    def values(self):
+        self._decode_mask()
+        return super(_LazyMaskShape, self).values()
+
+    def copy(self):
+        self._decode_mask()
+        return dict(self)
+
+    def pop(self, *args):
+        self._decode_mask()
+        return super(_LazyMaskShape, self).pop(*args)
+
+
 class LabelFile(object):
     suffix = ".json"
+    binary_suffix = ".labelme.npz"
+    mask_encodings = ["png", "rle"]
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, lazy=False):
         self.shapes = []
         self.imagePath = None
         self.imageData = None
+        # whether the loaded file embeds imageData instead of referring imagePath
+        self.hasImageData = False
         if filename is not None:
-            self.load(filename)
+            self.load(filename, lazy=lazy)
         self.filename = filename
 
+    @property
+    def imageData(self):
+        if self._imageDataLoader is not None:
+            self._imageData = self._imageDataLoader()
+            self._imageDataLoader = None
+        return self._imageData
+
+    @imageData.setter
+    def imageData(self, value):
+        self._imageData = value
+        self._imageDataLoader = None
+
     @staticmethod
     def load_image_file(filename):
         try:
@@ -51,7 +111,17 @@ class LabelFile(object):
             return
 
         # apply orientation to image according to exif
-        image_pil = utils.apply_exif_orientation(image_pil)
+        image_pil_oriented = utils.apply_exif_orientation(image_pil)
+
+        if (
+            image_pil_oriented is image_pil
+            and image_pil.format in ["JPEG", "PNG"]
+            and not (PY2 and QT4)
+        ):
+            # no transform is applied, so the original bytes can be used as is
+            with io.open(filename, "rb") as f:
+                return f.read()
+        image_pil = image_pil_oriented
 
         with io.BytesIO() as f:
             ext = osp.splitext(filename)[1].lower()
@@ -65,7 +135,7 @@ class LabelFile(object):
             f.seek(0)
             return f.read()
 
-    def load(self, filename):
+    def load(self, filename, lazy=False):
         keys = [
             "version",
             "imageData",
@@ -75,49 +145,30 @@ class LabelFile(object):
             "imageHeight",
             "imageWidth",
         ]
-        shape_keys = [
-            "label",
-            "points",
-            "group_id",
-            "shape_type",
-            "flags",
-            "description",
-            "mask",
-        ]
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-
-            if data["imageData"] is not None:
-                imageData = base64.b64decode(data["imageData"])
-                if PY2 and QT4:
-                    imageData = utils.img_data_to_png_data(imageData)
+            if self.is_binary_label_file(filename):
+                with io.open(filename, "rb") as f:
+                    data = _label_file_binary.load(f)
             else:
-                # relative path from label file to relative path from cwd
-                imagePath = osp.join(osp.dirname(filename), data["imagePath"])
-                imageData = self.load_image_file(imagePath)
+                with io.open(filename, "rb") as f:
+                    data = _json.load(f)
+
+            imageDataLoader = functools.partial(
+                self._load_image_data,
+                filename=filename,
+                imageData=data["imageData"],
+                imagePath=data["imagePath"],
+                imageHeight=data.get("imageHeight"),
+                imageWidth=data.get("imageWidth"),
+            )
+            if not lazy:
+                imageData = imageDataLoader()
             flags = data.get("flags") or {}
             imagePath = data["imagePath"]
-            self._check_image_height_and_width(
-                base64.b64encode(imageData).decode("utf-8"),
-                data.get("imageHeight"),
-                data.get("imageWidth"),
-            )
-            shapes = [
-                dict(
-                    label=s["label"],
-                    points=s["points"],
-                    shape_type=s.get("shape_type", "polygon"),
-                    flags=s.get("flags", {}),
-                    description=s.get("description"),
-                    group_id=s.get("group_id"),
-                    mask=utils.img_b64_to_arr(s["mask"]).astype(bool)
-                    if s.get("mask")
-                    else None,
-                    other_data={k: v for k, v in s.items() if k not in shape_keys},
-                )
-                for s in data["shapes"]
-            ]
+            hasImageData = data["imageData"] is not None
+            imageHeight = data.get("imageHeight")
+            imageWidth = data.get("imageWidth")
+            shapes = [self._load_shape(s) for s in data["shapes"]]
         except Exception as e:
             raise LabelFileError(e)
 
@@ -130,25 +181,122 @@ class LabelFile(object):
         self.flags = flags
         self.shapes = shapes
         self.imagePath = imagePath
-        self.imageData = imageData
+        self.hasImageData = hasImageData
+        self.imageHeight = imageHeight
+        self.imageWidth = imageWidth
+        if lazy:
+            self._imageData = None
+            self._imageDataLoader = imageDataLoader
+        else:
+            self.imageData = imageData
         self.filename = filename
         self.otherData = otherData
 
+    @classmethod
+    def iter_shapes(cls, filename):
+        """Yield shapes of a label file one by one.
+
+        The file is parsed incrementally, so the memory usage is bounded by the
+        largest shape instead of the whole file. Masks are decoded on the first
+        access of shape["mask"].
+        """
+        try:
+            if cls.is_binary_label_file(filename):
+                # binary masks are compact, so all shapes are loaded at once
+                with io.open(filename, "rb") as f:
+                    data = _label_file_binary.load(f)
+                for s in data["shapes"]:
+                    yield cls._load_shape(s)
+                return
+            with open(filename, "r") as f:
+                reader = JsonStreamReader(f)
+                for key in reader.iter_object():
+                    if key != "shapes":
+                        reader.decode()
+                        continue
+                    for s in reader.iter_array():
+                        yield cls._load_shape(s, lazy_mask=True)
+                    return
+        except Exception as e:
+            raise LabelFileError(e)
+
+    @staticmethod
+    def _load_shape(s, lazy_mask=False):
+        shape_keys = [
+            "label",
+            "points",
+            "group_id",
+            "shape_type",
+            "flags",
+            "description",
+            "mask",
+        ]
+        mask = s.get("mask")
+        if isinstance(mask, (str, dict)):
+            if not mask:
+                mask = None
+            elif not lazy_mask:
+                mask = LabelFile.decode_mask(mask)
+        shape_class = _LazyMaskShape if lazy_mask else dict
+        return shape_class(
+            label=s["label"],
+            points=s["points"],
+            shape_type=s.get("shape_type", "polygon"),
+            flags=s.get("flags", {}),
+            description=s.get("description"),
+            group_id=s.get("group_id"),
+            mask=mask,
+            other_data={k: v for k, v in s.items() if k not in shape_keys},
+        )
+
+    @staticmethod
+    def encode_mask(mask, mask_encoding="png"):
+        """Encode a mask for JSON as base64 PNG or uncompressed COCO RLE."""
+        if mask_encoding == "png":
+            return utils.img_arr_to_b64(mask.astype(np.uint8))
+        if mask_encoding == "rle":
+            return utils.mask_to_rle(mask)
+        raise ValueError("Unexpected mask_encoding: {}".format(mask_encoding))
+
+    @staticmethod
+    def decode_mask(mask):
+        """Decode a mask encoded by encode_mask."""
+        if isinstance(mask, dict):
+            return utils.rle_to_mask(mask)
+        return utils.img_b64_to_arr(mask).astype(bool)
+
+    @classmethod
+    def _load_image_data(cls, filename, imageData, imagePath, imageHeight, imageWidth):
+        try:
+            if imageData is not None:
+                if isinstance(imageData, str):
+                    imageData = base64.b64decode(imageData)
+                if PY2 and QT4:
+                    imageData = utils.img_data_to_png_data(imageData)
+            else:
+                # relative path from label file to relative path from cwd
+                imagePath = osp.join(osp.dirname(filename), imagePath)
+                imageData = cls.load_image_file(imagePath)
+            cls._check_image_height_and_width(imageData, imageHeight, imageWidth)
+        except Exception as e:
+            raise LabelFileError(e)
+        return imageData
+
     @staticmethod
     def _check_image_height_and_width(imageData, imageHeight, imageWidth):
-        img_arr = utils.img_b64_to_arr(imageData)
-        if imageHeight is not None and img_arr.shape[0] != imageHeight:
+        height, width = utils.img_data_to_size(imageData)
+        if imageHeight is not None and height != imageHeight:
             logger.error(
                 "imageHeight does not match with imageData or imagePath, "
                 "so getting imageHeight from actual image."
             )
-            imageHeight = img_arr.shape[0]
-        if imageWidth is not None and img_arr.shape[1] != imageWidth:
+            imageHeight = height
+        if imageWidth is not None and width != imageWidth:
             logger.error(
                 "imageWidth does not match with imageData or imagePath, "
                 "so getting imageWidth from actual image."
             )
-            imageWidth = img_arr.shape[1]
+            imageWidth = width
         return imageHeight, imageWidth
 
     def save(
@@ -161,9 +309,11 @@ class LabelFile(object):
         imageData=None,
         otherData=None,
         flags=None,
+        compact=False,
+        mask_encoding="png",
+        imageDataB64=None,
     ):
         if imageData is not None:
-            imageData = base64.b64encode(imageData).decode("utf-8")
             imageHeight, imageWidth = self._check_image_height_and_width(
                 imageData, imageHeight, imageWidth
             )
@@ -184,12 +334,45 @@ class LabelFile(object):
             assert key not in data
             data[key] = value
         try:
-            with open(filename, "w") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if not self.is_binary_label_file(filename):
+                if imageData is not None:
+                    # the caller may pass the base64 of imageData it already has
+                    if imageDataB64 is None:
+                        imageDataB64 = self.encode_image_data(imageData)
+                    data["imageData"] = imageDataB64
+                data["shapes"] = [
+                    dict(s, mask=self.encode_mask(s["mask"], mask_encoding))
+                    if isinstance(s.get("mask"), np.ndarray)
+                    else s
+                    for s in shapes
+                ]
+            # write to a temporary file and rename it, so that the label file is
+            # never left partially written
+            tmp_filename = "{}.{}.tmp".format(filename, uuid.uuid4().hex)
+            try:
+                with io.open(tmp_filename, "xb") as f:
+                    if self.is_binary_label_file(filename):
+                        _label_file_binary.dump(data, f)
+                    else:
+                        _json.dump(data, f, compact=compact)
+                os.replace(tmp_filename, filename)
+            except Exception:
+                if osp.exists(tmp_filename):
+                    os.remove(tmp_filename)
+                raise
             self.filename = filename
         except Exception as e:
             raise LabelFileError(e)
 
+    @staticmethod
+    def encode_image_data(imageData):
+        return base64.b64encode(imageData).decode("utf-8")
+
     @staticmethod
     def is_label_file(filename):
-        return osp.splitext(filename)[1].lower() == LabelFile.suffix
+        ext = osp.splitext(filename)[1].lower()
+        return ext == LabelFile.suffix or LabelFile.is_binary_label_file(filename)
+
+    @staticmethod
+    def is_binary_label_file(filename):
+        return filename.lower().endswith(LabelFile.binary_suffix)
@@ -8,9 +8,6 @@ from qtpy import QtGui
 import labelme.utils
 from labelme.logger import logger
 
-# TODO(unknown):
-# - [opt] Store paths instead of creating new ones at each paint.
-
 
 class Shape(object):
     # Render handles as squares
@@ -37,6 +34,41 @@ class Shape(object):
     point_type = P_ROUND
     point_size = 8
     scale = 1.0
+    # Vertices closer than this on screen are not drawn if painted with lod
+    lod_min_vertex_spacing = 4.0
+
+    # Incremented whenever the geometry of any shape is changed
+    _geometry_revision_counter = 0
+
+    # Attributes that are saved to label files, see getSerialized
+    _serialized_attrs = frozenset(
+        [
+            "label",
+            "points",
+            "group_id",
+            "description",
+            "shape_type",
+            "flags",
+            "mask",
+            "other_data",
+        ]
+    )
+
+    # Attributes that change the geometry, see _invalidateGeometry
+    _geometry_attrs = frozenset(["points", "point_labels", "shape_type"])
+
+    # Caches of Qt objects, which are dropped in copies, see __getstate__
+    _cache_attrs = frozenset(
+        [
+            "_path_cache",
+            "_bounding_rect_cache",
+            "_paint_paths_cache",
+            "_points_array_cache",
+            "_mean_vertex_spacing_cache",
+            "_mask_image_cache",
+            "_mask_contour_cache",
+        ]
+    )
 
     def __init__(
         self,
@@ -48,6 +80,14 @@ class Shape(object):
         description=None,
         mask=None,
     ):
+        self._serialized = None
+        self._path_cache = None
+        self._bounding_rect_cache = None
+        self._paint_paths_cache = None  # (key, paths)
+        self._points_array_cache = None
+        self._mean_vertex_spacing_cache = None
+        self._mask_image_cache = None  # (mask, fill_color, scale, array, qimage)
+        self._mask_contour_cache = None  # (mask, path)
         self.label = label
         self.group_id = group_id
         self.points = []
@@ -78,6 +118,52 @@ class Shape(object):
             # is used for drawing the pending line a different color.
             self.line_color = line_color
 
+    def __setattr__(self, name, value):
+        if name in self._serialized_attrs:
+            object.__setattr__(self, "_serialized", None)
+        if name in self._geometry_attrs:
+            self._invalidateGeometry()
+        object.__setattr__(self, name, value)
+
+    def _invalidateGeometry(self):
+        object.__setattr__(self, "_path_cache", None)
+        object.__setattr__(self, "_bounding_rect_cache", None)
+        object.__setattr__(self, "_paint_paths_cache", None)
+        object.__setattr__(self, "_points_array_cache", None)
+        object.__setattr__(self, "_mean_vertex_spacing_cache", None)
+        Shape._geometry_revision_counter += 1
+        object.__setattr__(self, "_geometry_revision", Shape._geometry_revision_counter)
+
+    def geometryRevision(self):
+        """Return a number that increases whenever the geometry is changed."""
+        return self._geometry_revision
+
+    @staticmethod
+    def latestGeometryRevision():
+        """Return the latest geometryRevision of all shapes."""
+        return Shape._geometry_revision_counter
+
+    def _pointsChanged(self):
+        """Invalidate the caches after points are mutated in place."""
+        self._serialized = None
+        self._invalidateGeometry()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._cache_attrs:
+            state[name] = None
+        return state
+
+    def getSerialized(self, serialize):
+        """Return serialize(self), which is cached until the shape is mutated.
+
+        In-place mutations of points must go through the methods of Shape, and
+        flags and other_data must be reassigned instead of mutated in place.
+        """
+        if self._serialized is None:
+            self._serialized = serialize(self)
+        return self._serialized
+
     def _scale_point(self, point: QtCore.QPointF) -> QtCore.QPointF:
         return QtCore.QPointF(point.x() * self.scale, point.y() * self.scale)
 
@@ -124,6 +210,7 @@ class Shape(object):
         else:
             self.points.append(point)
             self.point_labels.append(label)
+            self._pointsChanged()
 
     def canAddPoint(self):
         return self.shape_type in ["polygon", "linestrip"]
@@ -132,12 +219,14 @@ class Shape(object):
         if self.points:
             if self.point_labels:
                 self.point_labels.pop()
+            self._pointsChanged()
             return self.points.pop()
         return None
 
     def insertPoint(self, i, point, label=1):
         self.points.insert(i, point)
         self.point_labels.insert(i, label)
+        self._pointsChanged()
 
     def removePoint(self, i):
         if not self.canAddPoint():
@@ -165,6 +254,7 @@ class Shape(object):
 
         self.points.pop(i)
         self.point_labels.pop(i)
+        self._pointsChanged()
 
     def isClosed(self):
         return self._closed
@@ -172,7 +262,7 @@ class Shape(object):
     def setOpen(self):
         self._closed = False
 
-    def paint(self, painter):
+    def paint(self, painter, lod=False):
         if self.mask is None and not self.points:
             return
 
@@ -183,86 +273,20 @@ class Shape(object):
         painter.setPen(pen)
 
         if self.mask is not None:
-            image_to_draw = np.zeros(self.mask.shape + (4,), dtype=np.uint8)
-            fill_color = (
-                self.select_fill_color.getRgb()
-                if self.selected
-                else self.fill_color.getRgb()
+            fill_color = self.select_fill_color if self.selected else self.fill_color
+            painter.drawImage(
+                self._scale_point(point=self.points[0]),
+                self._getMaskImage(fill_color=fill_color.getRgb()),
             )
-            image_to_draw[self.mask] = fill_color
-            qimage = QtGui.QImage.fromData(labelme.utils.img_arr_to_data(image_to_draw))
-            qimage = qimage.scaled(
-                qimage.size() * self.scale,
-                QtCore.Qt.IgnoreAspectRatio,
-                QtCore.Qt.SmoothTransformation,
+            x, y = self.points[0].x(), self.points[0].y()
+            painter.drawPath(
+                QtGui.QTransform(
+                    self.scale, 0, 0, self.scale, x * self.scale, y * self.scale
+                ).map(self._getMaskContourPath())
             )
 
-            painter.drawImage(self._scale_point(point=self.points[0]), qimage)
-
-            line_path = QtGui.QPainterPath()
-            contours = skimage.measure.find_contours(np.pad(self.mask, pad_width=1))
-            for contour in contours:
-                contour += [self.points[0].y(), self.points[0].x()]
-                line_path.moveTo(
-                    self._scale_point(QtCore.QPointF(contour[0, 1], contour[0, 0]))
-                )
-                for point in contour[1:]:
-                    line_path.lineTo(
-                        self._scale_point(QtCore.QPointF(point[1], point[0]))
-                    )
-            painter.drawPath(line_path)
-
         if self.points:
-            line_path = QtGui.QPainterPath()
-            vrtx_path = QtGui.QPainterPath()
-            negative_vrtx_path = QtGui.QPainterPath()
-
-            if self.shape_type in ["rectangle", "mask"]:
-                assert len(self.points) in [1, 2]
-                if len(self.points) == 2:
-                    rectangle = QtCore.QRectF(
-                        self._scale_point(self.points[0]),
-                        self._scale_point(self.points[1]),
-                    )
-                    line_path.addRect(rectangle)
-                if self.shape_type == "rectangle":
-                    for i in range(len(self.points)):
-                        self.drawVertex(vrtx_path, i)
-            elif self.shape_type == "circle":
-                assert len(self.points) in [1, 2]
-                if len(self.points) == 2:
-                    raidus = labelme.utils.distance(
-                        self._scale_point(self.points[0] - self.points[1])
-                    )
-                    line_path.addEllipse(
-                        self._scale_point(self.points[0]), raidus, raidus
-                    )
-                for i in range(len(self.points)):
-                    self.drawVertex(vrtx_path, i)
-            elif self.shape_type == "linestrip":
-                line_path.moveTo(self._scale_point(self.points[0]))
-                for i, p in enumerate(self.points):
-                    line_path.lineTo(self._scale_point(p))
-                    self.drawVertex(vrtx_path, i)
-            elif self.shape_type == "points":
-                assert len(self.points) == len(self.point_labels)
-                for i, point_label in enumerate(self.point_labels):
-                    if point_label == 1:
-                        self.drawVertex(vrtx_path, i)
-                    else:
-                        self.drawVertex(negative_vrtx_path, i)
-            else:
-                line_path.moveTo(self._scale_point(self.points[0]))
-                # Uncommenting the following line will draw 2 paths
-                # for the 1st vertex, and make it non-filled, which
-                # may be desirable.
-                # self.drawVertex(vrtx_path, 0)
-
-                for i, p in enumerate(self.points):
-                    line_path.lineTo(self._scale_point(p))
-                    self.drawVertex(vrtx_path, i)
-                if self.isClosed():
-                    line_path.lineTo(self._scale_point(self.points[0]))
+            line_path, vrtx_path, negative_vrtx_path = self._getPaintPaths(lod=lod)
 
             painter.drawPath(line_path)
             if vrtx_path.length() > 0:
@@ -272,10 +296,161 @@ class Shape(object):
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
-            pen.setColor(QtGui.QColor(255, 0, 0, 255))
-            painter.setPen(pen)
-            painter.drawPath(negative_vrtx_path)
-            painter.fillPath(negative_vrtx_path, QtGui.QColor(255, 0, 0, 255))
+            if not negative_vrtx_path.isEmpty():
+                pen.setColor(QtGui.QColor(255, 0, 0, 255))
+                painter.setPen(pen)
+                painter.drawPath(negative_vrtx_path)
+                painter.fillPath(negative_vrtx_path, QtGui.QColor(255, 0, 0, 255))
+
+    def _getPaintPaths(self, lod=False):
+        """Return the line and vertex paths to paint, cached until changed."""
+        if self._highlightIndex is not None:
+            self._vertex_fill_color = self.hvertex_fill_color
+        else:
+            self._vertex_fill_color = self.vertex_fill_color
+        # with lod, vertices are not drawn if they overlap on screen and lines
+        # are simplified, unless the shape is edited
+        detailed = (
+            not lod
+            or self.selected
+            or self._highlightIndex is not None
+            or self.shape_type in ["point", "points"]
+            or self._getMeanVertexSpacing() * self.scale >= self.lod_min_vertex_spacing
+        )
+        key = (
+            self.scale,
+            self.isClosed(),
+            self._highlightIndex,
+            self._highlightMode,
+            self.point_type,
+            self.point_size,
+            detailed,
+        )
+        if self._paint_paths_cache is not None and self._paint_paths_cache[0] == key:
+            return self._paint_paths_cache[1]
+
+        line_path = QtGui.QPainterPath()
+        vrtx_path = QtGui.QPainterPath()
+        negative_vrtx_path = QtGui.QPainterPath()
+
+        if self.shape_type in ["rectangle", "mask"]:
+            assert len(self.points) in [1, 2]
+            if len(self.points) == 2:
+                rectangle = QtCore.QRectF(
+                    self._scale_point(self.points[0]),
+                    self._scale_point(self.points[1]),
+                )
+                line_path.addRect(rectangle)
+            if self.shape_type == "rectangle" and detailed:
+                for i in range(len(self.points)):
+                    self.drawVertex(vrtx_path, i)
+        elif self.shape_type == "circle":
+            assert len(self.points) in [1, 2]
+            if len(self.points) == 2:
+                raidus = labelme.utils.distance(
+                    self._scale_point(self.points[0] - self.points[1])
+                )
+                line_path.addEllipse(self._scale_point(self.points[0]), raidus, raidus)
+            if detailed:
+                for i in range(len(self.points)):
+                    self.drawVertex(vrtx_path, i)
+        elif self.shape_type == "linestrip":
+            self._addPolyline(line_path, simplify=not detailed)
+            if detailed:
+                for i in range(len(self.points)):
+                    self.drawVertex(vrtx_path, i)
+        elif self.shape_type == "points":
+            assert len(self.points) == len(self.point_labels)
+            for i, point_label in enumerate(self.point_labels):
+                if point_label == 1:
+                    self.drawVertex(vrtx_path, i)
+                else:
+                    self.drawVertex(negative_vrtx_path, i)
+        else:
+            # Uncommenting the following line will draw 2 paths
+            # for the 1st vertex, and make it non-filled, which
+            # may be desirable.
+            # self.drawVertex(vrtx_path, 0)
+
+            self._addPolyline(line_path, simplify=not detailed)
+            if detailed:
+                for i in range(len(self.points)):
+                    self.drawVertex(vrtx_path, i)
+            if self.isClosed():
+                line_path.lineTo(self._scale_point(self.points[0]))
+
+        paths = (line_path, vrtx_path, negative_vrtx_path)
+        self._paint_paths_cache = (key, paths)
+        return paths
+
+    def _addPolyline(self, path, simplify=False):
+        points = self._getPointsArray()
+        if simplify and len(points) > 8:
+            # deviations within a half pixel on screen are not noticeable
+            points = skimage.measure.approximate_polygon(
+                points, tolerance=0.5 / self.scale
+            )
+        path.addPolygon(
+            QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in points * self.scale])
+        )
+
+    def _getMeanVertexSpacing(self):
+        """Return the mean distance between the consecutive vertices."""
+        if self._mean_vertex_spacing_cache is None:
+            points = self._getPointsArray()
+            if len(points) < 2:
+                self._mean_vertex_spacing_cache = float("inf")
+            else:
+                self._mean_vertex_spacing_cache = float(
+                    np.hypot(*np.diff(points, axis=0).T).mean()
+                )
+        return self._mean_vertex_spacing_cache
+
+    def _getMaskImage(self, fill_color):
+        # the mask is not copied in place, so the identity is its version
+        cache = self._mask_image_cache
+        if (
+            cache is not None
+            and cache[0] is self.mask
+            and cache[1:3] == (fill_color, self.scale)
+        ):
+            return cache[4]
+
+        image_to_draw = self.mask[:, :, None] * np.array(fill_color, dtype=np.uint8)
+        height, width = self.mask.shape
+        qimage = QtGui.QImage(
+            image_to_draw.data,
+            width,
+            height,
+            image_to_draw.strides[0],
+            QtGui.QImage.Format_RGBA8888,
+        )
+        qimage = qimage.scaled(
+            qimage.size() * self.scale,
+            QtCore.Qt.IgnoreAspectRatio,
+            QtCore.Qt.SmoothTransformation,
+        )
+        # the array is kept, since qimage may share the buffer of it
+        self._mask_image_cache = (
+            self.mask,
+            fill_color,
+            self.scale,
+            image_to_draw,
+            qimage,
+        )
+        return qimage
+
+    def _getMaskContourPath(self):
+        """Return the contours of the mask relative to the top-left of it."""
+        cache = self._mask_contour_cache
+        if cache is not None and cache[0] is self.mask:
+            return cache[1]
+
+        path = QtGui.QPainterPath()
+        for contour in skimage.measure.find_contours(np.pad(self.mask, pad_width=1)):
+            path.addPolygon(QtGui.QPolygonF([QtCore.QPointF(x, y) for y, x in contour]))
+        self._mask_contour_cache = (self.mask, path)
+        return path
 
     def drawVertex(self, path, i):
         d = self.point_size
@@ -295,33 +470,38 @@ class Shape(object):
         else:
             assert False, "unsupported vertex shape"
 
+    def _getPointsArray(self):
+        """Return the points as an array of (N, 2), cached until changed."""
+        if self._points_array_cache is None:
+            self._points_array_cache = np.array(
+                [[p.x(), p.y()] for p in self.points], dtype=np.float64
+            ).reshape(-1, 2)
+        return self._points_array_cache
+
     def nearestVertex(self, point, epsilon):
-        min_distance = float("inf")
-        min_i = None
-        point = QtCore.QPointF(point.x() * self.scale, point.y() * self.scale)
-        for i, p in enumerate(self.points):
-            p = QtCore.QPointF(p.x() * self.scale, p.y() * self.scale)
-            dist = labelme.utils.distance(p - point)
-            if dist <= epsilon and dist < min_distance:
-                min_distance = dist
-                min_i = i
-        return min_i
+        points = self._getPointsArray()
+        if len(points) == 0:
+            return None
+        distances = np.hypot(*(points - (point.x(), point.y())).T) * self.scale
+        i = int(np.argmin(distances))
+        if distances[i] <= epsilon:
+            return i
+        return None
 
     def nearestEdge(self, point, epsilon):
-        min_distance = float("inf")
-        post_i = None
-        point = QtCore.QPointF(point.x() * self.scale, point.y() * self.scale)
-        for i in range(len(self.points)):
-            start = self.points[i - 1]
-            end = self.points[i]
-            start = QtCore.QPointF(start.x() * self.scale, start.y() * self.scale)
-            end = QtCore.QPointF(end.x() * self.scale, end.y() * self.scale)
-            line = [start, end]
-            dist = labelme.utils.distancetoline(point, line)
-            if dist <= epsilon and dist < min_distance:
-                min_distance = dist
-                post_i = i
-        return post_i
+        # the edge i is from the vertex i - 1 to the vertex i
+        ends = self._getPointsArray()
+        if len(ends) == 0:
+            return None
+        starts = np.roll(ends, 1, axis=0)
+        distances = (
+            _compute_distances_to_segments((point.x(), point.y()), starts, ends)
+            * self.scale
+        )
+        i = int(np.argmin(distances))
+        if distances[i] <= epsilon:
+            return i
+        return None
 
     def containsPoint(self, point):
         if self.mask is not None:
@@ -336,7 +516,7 @@ class Shape(object):
                 self.mask.shape[1] - 1,
             )
             return self.mask[y, x]
-        return self.makePath().contains(point)
+        return self._getPath().contains(point)
 
     def makePath(self):
         if self.shape_type in ["rectangle", "mask"]:
@@ -354,14 +534,22 @@ class Shape(object):
                 path.lineTo(p)
         return path
 
+    def _getPath(self):
+        if self._path_cache is None:
+            self._path_cache = self.makePath()
+        return self._path_cache
+
     def boundingRect(self):
-        return self.makePath().boundingRect()
+        if self._bounding_rect_cache is None:
+            self._bounding_rect_cache = self._getPath().boundingRect()
+        return QtCore.QRectF(self._bounding_rect_cache)
 
     def moveBy(self, offset):
         self.points = [p + offset for p in self.points]
 
     def moveVertexBy(self, i, offset):
         self.points[i] = self.points[i] + offset
+        self._pointsChanged()
 
     def highlightVertex(self, i, action):
         """Highlight a vertex appropriately based on the current action
@@ -389,3 +577,29 @@ class Shape(object):
 
     def __setitem__(self, key, value):
         self.points[key] = value
+        self._pointsChanged()
+
+
+def _compute_distances_to_segments(point, starts, ends):
+    """Vectorized labelme.utils.distancetoline over segments of (N, 2) arrays."""
+    point = np.asarray(point, dtype=np.float64)
+    segments = ends - starts
+    distances_to_starts = np.hypot(*(point - starts).T)
+    distances_to_ends = np.hypot(*(point - ends).T)
+    lengths = np.hypot(*segments.T)
+    vectors_from_starts = starts - point
+    crosses = (
+        segments[:, 0] * vectors_from_starts[:, 1]
+        - segments[:, 1] * vectors_from_starts[:, 0]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances_to_lines = np.abs(crosses) / lengths
+    return np.select(
+        [
+            np.einsum("ij,ij->i", point - starts, segments) < 0,
+            np.einsum("ij,ij->i", point - ends, -segments) < 0,
+            lengths == 0,
+        ],
+        [distances_to_starts, distances_to_ends, distances_to_starts],
+        default=distances_to_lines,
+    )
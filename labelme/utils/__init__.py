@@ -4,17 +4,21 @@ from ._io import lblsave
 
 from .image import apply_exif_orientation
 from .image import img_arr_to_b64
+from .image import img_arr_to_qt
 from .image import img_arr_to_data
 from .image import img_b64_to_arr
 from .image import img_data_to_arr
 from .image import img_data_to_pil
 from .image import img_data_to_png_data
+from .image import img_data_to_size
 from .image import img_pil_to_data
 from .image import img_qt_to_arr
 
 from .shape import labelme_shapes_to_label
+from .shape import mask_to_rle
 from .shape import masks_to_bboxes
 from .shape import polygons_to_mask
+from .shape import rle_to_mask
 from .shape import shape_to_mask
 from .shape import shapes_to_label
 
@@ -8,6 +8,7 @@ import numpy as np
 import PIL.ExifTags
 import PIL.Image
 import PIL.ImageOps
+from qtpy import QtGui
 
 
 def img_data_to_pil(img_data):
@@ -29,6 +30,14 @@ def img_b64_to_arr(img_b64):
     return img_arr
 
 
+def img_data_to_size(img_data):
+    # PIL.Image.open only parses the header, so pixels are never decoded
+    with io.BytesIO(img_data) as f:
+        img_pil = PIL.Image.open(f)
+        width, height = img_pil.size
+    return height, width
+
+
 def img_pil_to_data(img_pil):
     f = io.BytesIO()
     img_pil.save(f, format="PNG")
@@ -60,12 +69,23 @@ def img_data_to_png_data(img_data):
 
 
 def img_qt_to_arr(img_qt):
-    w, h, d = img_qt.size().width(), img_qt.size().height(), img_qt.depth()
-    bytes_ = img_qt.bits().asstring(w * h * d // 8)
-    img_arr = np.frombuffer(bytes_, dtype=np.uint8).reshape((h, w, d // 8))
+    img_qt = img_qt.convertToFormat(QtGui.QImage.Format_RGBA8888)
+    w, h = img_qt.size().width(), img_qt.size().height()
+    bytes_ = img_qt.bits().asstring(w * h * 4)
+    img_arr = np.frombuffer(bytes_, dtype=np.uint8).reshape((h, w, 4))
     return img_arr
 
 
+def img_arr_to_qt(img_arr):
+    # The returned QImage views the buffer of img_arr without copying,
+    # so img_arr must be kept alive as long as the QImage is used.
+    assert img_arr.dtype == np.uint8
+    assert img_arr.ndim == 3 and img_arr.shape[2] == 4
+    assert img_arr.flags.c_contiguous
+    h, w = img_arr.shape[:2]
+    return QtGui.QImage(img_arr.data, w, h, w * 4, QtGui.QImage.Format_RGBA8888)
+
+
 def apply_exif_orientation(image):
     try:
         exif = image._getexif()
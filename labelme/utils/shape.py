@@ -107,3 +107,38 @@ def masks_to_bboxes(masks):
         bboxes.append((y1, x1, y2, x2))
     bboxes = np.asarray(bboxes, dtype=np.float32)
     return bboxes
+
+
+def mask_to_rle(mask):
+    """Encode a mask to the uncompressed RLE of COCO.
+
+    The counts are the run lengths of the mask in column-major order,
+    starting with a run of zeros.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim != 2:
+        raise ValueError("mask.ndim must be 2, but it is {}".format(mask.ndim))
+    flat = mask.ravel(order="F")
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.r_[0, changes, flat.size]
+    counts = np.diff(bounds)
+    if flat.size and flat[0]:
+        counts = np.r_[0, counts]
+    return dict(size=list(mask.shape), counts=counts.tolist())
+
+
+def rle_to_mask(rle):
+    """Decode the uncompressed RLE of COCO to a mask."""
+    if not isinstance(rle.get("counts"), list):
+        raise ValueError("Only uncompressed RLE, whose counts is a list, is supported")
+    height, width = rle["size"]
+    counts = np.asarray(rle["counts"], dtype=np.int64)
+    if counts.sum() != height * width:
+        raise ValueError(
+            "Sum of RLE counts must be {}, but it is {}".format(
+                height * width, counts.sum()
+            )
+        )
+    values = np.arange(len(counts)) % 2 == 1
+    flat = np.repeat(values, counts)
+    return flat.reshape((height, width), order="F")
@@ -0,0 +1,72 @@
+import collections
+import threading
+
+from qtpy import QtCore
+
+from labelme.logger import logger
+
+
+class AiPreviewWorker(QtCore.QObject):
+    """Predict previews of AI shapes on a worker thread.
+
+    Only the latest request is run, and older pending requests are dropped.
+    Results are cached per key, e.g., the prompt points, and finished is
+    emitted when a new result is available.
+    """
+
+    finished = QtCore.Signal()
+
+    def __init__(self, parent=None, cache_size=32):
+        super(AiPreviewWorker, self).__init__(parent)
+        self._condition = threading.Condition()
+        self._cache_size = cache_size
+        self._results = collections.OrderedDict()  # key -> result
+        self._latest = None  # (key, result) finished last
+        self._request = None  # (generation, key, predict)
+        self._generation = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get(self, key):
+        with self._condition:
+            return self._results.get(key)
+
+    def latest(self):
+        with self._condition:
+            return self._latest
+
+    def request(self, key, predict):
+        with self._condition:
+            self._request = (self._generation, key, predict)
+            self._condition.notify_all()
+
+    def clear(self):
+        """Drop the results and requests, e.g., when the image is changed."""
+        with self._condition:
+            self._generation += 1
+            self._results.clear()
+            self._latest = None
+            self._request = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None:
+                    self._condition.wait()
+                generation, key, predict = self._request
+                self._request = None
+                if key in self._results:
+                    continue
+            try:
+                result = predict()
+            except Exception as e:
+                logger.debug("Failed to predict AI preview: {}".format(e))
+                continue
+            with self._condition:
+                if generation != self._generation:
+                    continue
+                self._results[key] = result
+                while len(self._results) > self._cache_size:
+                    self._results.popitem(last=False)
+                self._latest = (key, result)
+            self.finished.emit()
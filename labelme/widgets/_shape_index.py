@@ -0,0 +1,119 @@
+import collections
+import math
+
+from qtpy import QtCore
+
+from labelme.shape import Shape
+
+
+class ShapeIndex(object):
+    """Uniform grid over bounding rects of shapes to find shapes near a point.
+
+    The index is synchronized with the list of shapes at each query, where
+    only the shapes changed since the last query are registered again, so the
+    edits of the shapes need not be notified.
+    """
+
+    # for rounding of mask pixels in Shape.containsPoint
+    _padding = 1.0
+
+    def __init__(self, cell_size=256, max_cells_per_shape=64):
+        self._cell_size = cell_size
+        self._max_cells_per_shape = max_cells_per_shape
+        self._shapes = []
+        self._order = {}  # shape -> index in shapes
+        self._revision = None  # Shape.latestGeometryRevision() at the last sync
+        self._entries = {}  # shape -> (revision, rect, cells)
+        self._cells = collections.defaultdict(set)  # (i, j) -> shapes
+        self._large_shapes = set()  # shapes over too many cells
+
+    def query(self, shapes, point, margin=0.0):
+        """Return shapes whose bounding rect with the margin contains the point.
+
+        The shapes are returned in the order of the list of shapes.
+        """
+        x, y = point.x(), point.y()
+        return self.query_rect(shapes, QtCore.QRectF(x, y, 0, 0), margin=margin)
+
+    def query_rect(self, shapes, rect, margin=0.0):
+        """Return shapes whose bounding rect with the margin intersects the rect."""
+        self._sync(shapes)
+
+        x1, y1 = rect.left() - margin, rect.top() - margin
+        x2, y2 = rect.right() + margin, rect.bottom() + margin
+        candidates = set(self._large_shapes)
+        i_range, j_range = self._get_cell_range(x1, y1, x2, y2)
+        if len(i_range) * len(j_range) > len(self._cells):
+            # e.g., the whole image when zoomed out
+            for cell_shapes in self._cells.values():
+                candidates.update(cell_shapes)
+        else:
+            for cell in self._get_cells(x1, y1, x2, y2):
+                candidates.update(self._cells.get(cell, ()))
+
+        found = []
+        for shape in candidates:
+            shape_x1, shape_y1, shape_x2, shape_y2 = self._entries[shape][1]
+            if shape_x1 <= x2 and x1 <= shape_x2 and shape_y1 <= y2 and y1 <= shape_y2:
+                found.append(shape)
+        found.sort(key=self._order.__getitem__)
+        return found
+
+    def _sync(self, shapes):
+        if shapes != self._shapes:  # compared by identity of the shapes
+            self._shapes = list(shapes)
+            self._order = {shape: i for i, shape in enumerate(self._shapes)}
+            for shape in [s for s in self._entries if s not in self._order]:
+                self._remove(shape)
+            self._revision = None
+
+        if self._revision == Shape.latestGeometryRevision():
+            return
+        for shape in self._shapes:
+            entry = self._entries.get(shape)
+            if entry is None or entry[0] != shape.geometryRevision():
+                self._add(shape)
+        self._revision = Shape.latestGeometryRevision()
+
+    def _get_cell_range(self, x1, y1, x2, y2):
+        return (
+            range(
+                math.floor(x1 / self._cell_size), math.floor(x2 / self._cell_size) + 1
+            ),
+            range(
+                math.floor(y1 / self._cell_size), math.floor(y2 / self._cell_size) + 1
+            ),
+        )
+
+    def _get_cells(self, x1, y1, x2, y2):
+        i_range, j_range = self._get_cell_range(x1, y1, x2, y2)
+        return [(i, j) for i in i_range for j in j_range]
+
+    def _add(self, shape):
+        self._remove(shape)
+        rect = shape.boundingRect()
+        rect = (
+            rect.left() - self._padding,
+            rect.top() - self._padding,
+            rect.right() + self._padding,
+            rect.bottom() + self._padding,
+        )
+        i_range, j_range = self._get_cell_range(*rect)
+        if len(i_range) * len(j_range) > self._max_cells_per_shape:
+            cells = []
+            self._large_shapes.add(shape)
+        else:
+            cells = [(i, j) for i in i_range for j in j_range]
+            for cell in cells:
+                self._cells[cell].add(shape)
+        self._entries[shape] = (shape.geometryRevision(), rect, cells)
+
+    def _remove(self, shape):
+        entry = self._entries.pop(shape, None)
+        if entry is None:
+            return
+        self._large_shapes.discard(shape)
+        for cell in entry[2]:
+            self._cells[cell].discard(shape)
+            if not self._cells[cell]:
+                del self._cells[cell]
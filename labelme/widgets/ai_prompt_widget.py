@@ -28,6 +28,10 @@ class AiPromptWidget(QtWidgets.QWidget):
         nms_params_widget = self.layout().itemAt(1).widget()
         return nms_params_widget.get_score_threshold()
 
+    def get_shape_type(self) -> str:
+        nms_params_widget = self.layout().itemAt(1).widget()
+        return nms_params_widget.get_shape_type()
+
 
 class _TextPromptWidget(QtWidgets.QWidget):
     def __init__(self, on_submit, parent=None):
@@ -60,6 +64,7 @@ class _NmsParamsWidget(QtWidgets.QWidget):
         self.layout().setContentsMargins(0, 0, 0, 0)
         self.layout().addWidget(_ScoreThresholdWidget(parent=parent))
         self.layout().addWidget(_IouThresholdWidget(parent=parent))
+        self.layout().addWidget(_ShapeTypeWidget(parent=parent))
 
     def get_score_threshold(self) -> float:
         score_threshold_widget: QtWidgets.QWidget = self.layout().itemAt(0).widget()
@@ -69,6 +74,10 @@ class _NmsParamsWidget(QtWidgets.QWidget):
         iou_threshold_widget: QtWidgets.QWidget = self.layout().itemAt(1).widget()
         return iou_threshold_widget.get_value()
 
+    def get_shape_type(self) -> str:
+        shape_type_widget: QtWidgets.QWidget = self.layout().itemAt(2).widget()
+        return shape_type_widget.get_value()
+
 
 class _ScoreThresholdWidget(QtWidgets.QWidget):
     def __init__(self, parent=None):
@@ -110,3 +119,23 @@ class _IouThresholdWidget(QtWidgets.QWidget):
     def get_value(self) -> float:
         threshold_widget: QtWidgets.QWidget = self.layout().itemAt(1).widget()
         return threshold_widget.value()
+
+
+class _ShapeTypeWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+
+        self.setLayout(QtWidgets.QHBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+
+        label = QtWidgets.QLabel(self.tr("Shape Type"))
+        self.layout().addWidget(label)
+
+        # polygon and mask are predicted by the AI model from the boxes
+        shape_type_widget: QtWidgets.QWidget = QtWidgets.QComboBox()
+        shape_type_widget.addItems(["rectangle", "polygon", "mask"])
+        self.layout().addWidget(shape_type_widget)
+
+    def get_value(self) -> str:
+        shape_type_widget: QtWidgets.QWidget = self.layout().itemAt(1).widget()
+        return shape_type_widget.currentText()
@@ -61,7 +61,21 @@ class BrightnessContrastDialog(QtWidgets.QDialog):
         if contrast != 1:
             img = PIL.ImageEnhance.Contrast(img).enhance(contrast)
 
-        qimage = QImage(
-            img.tobytes(), img.width, img.height, img.width * 3, QImage.Format_RGB888
-        )
+        if img.mode == "RGBA":
+            qimage = QImage(
+                img.tobytes(),
+                img.width,
+                img.height,
+                img.width * 4,
+                QImage.Format_RGBA8888,
+            )
+        else:
+            img = img.convert("RGB")
+            qimage = QImage(
+                img.tobytes(),
+                img.width,
+                img.height,
+                img.width * 3,
+                QImage.Format_RGB888,
+            )
         self.callback(qimage)
@@ -1,3 +1,6 @@
+import functools
+import multiprocessing
+
 import imgviz
 from qtpy import QtCore
 from qtpy import QtGui
@@ -8,6 +11,8 @@ import labelme.utils
 from labelme import QT5
 from labelme.logger import logger
 from labelme.shape import Shape
+from labelme.widgets._ai_preview import AiPreviewWorker
+from labelme.widgets._shape_index import ShapeIndex
 
 # TODO(unknown):
 # - [maybe] Find optimal epsilon value.
@@ -60,6 +65,10 @@ class Canvas(QtWidgets.QWidget):
                 "ai_mask": False,
             },
         )
+        # keyword arguments to initialize the ai model, e.g., embedding_cache
+        self._ai_model_kwargs = kwargs.pop("ai_model_kwargs", {})
+        # keyword arguments of labelme.ai.ModelClient to use the model server
+        self._ai_model_client_kwargs = kwargs.pop("ai_model_client_kwargs", None)
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
@@ -102,6 +111,12 @@ class Canvas(QtWidgets.QWidget):
         self.setFocusPolicy(QtCore.Qt.WheelFocus)
 
         self._ai_model = None
+        self._image_arr = None
+        self._aiPreviewWorker = AiPreviewWorker(parent=self)
+        self._aiPreviewShape = None  # (current, refined, shape)
+        # candidates of hit-testing near the cursor
+        self._shapeIndex = ShapeIndex()
+        self._aiPreviewWorker.finished.connect(self.update)
 
     def fillDrawing(self):
         return self._fill_drawing
@@ -136,16 +151,42 @@ class Canvas(QtWidgets.QWidget):
         if self._ai_model is not None and self._ai_model.name == model.name:
             logger.debug("AI model is already initialized: %r" % model.name)
         else:
-            logger.debug("Initializing AI model: %r" % model.name)
-            self._ai_model = model()
+            self._ai_model = self._connectAiModel(model=model)
+            if self._ai_model is None:
+                logger.debug("Initializing AI model: %r" % model.name)
+                self._ai_model = model(**self._ai_model_kwargs)
+        self._clearAiPreview()
 
         if self.pixmap is None:
             logger.warning("Pixmap is not set yet")
             return
 
-        self._ai_model.set_image(
-            image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
+        self._ai_model.set_image(image=self._getImageArray())
+
+    def _connectAiModel(self, model):
+        if self._ai_model_client_kwargs is None:
+            return None
+        # the local model is used if the connection is lost later
+        client = labelme.ai.ModelClient(
+            name=model.name,
+            fallback=functools.partial(model, **self._ai_model_kwargs),
+            **self._ai_model_client_kwargs,
         )
+        try:
+            client.connect()
+        except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+            logger.warning("Failed to connect to the AI model server: {}".format(e))
+            return None
+        logger.debug("Connected to the AI model server: %r" % model.name)
+        return client
+
+    def aiModel(self):
+        return self._ai_model
+
+    def _getImageArray(self):
+        if self._image_arr is None:
+            self._image_arr = labelme.utils.img_qt_to_arr(self.pixmap.toImage())
+        return self._image_arr
 
     def storeShapes(self):
         shapesBackup = []
@@ -328,7 +369,10 @@ class Canvas(QtWidgets.QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip(self.tr("Image"))
-        for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
+        nearby_shapes = self._shapeIndex.query(
+            self.shapes, pos, margin=self.epsilon / self.scale
+        )
+        for shape in reversed([s for s in nearby_shapes if self.isVisible(s)]):
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearestVertex(pos, self.epsilon)
@@ -437,7 +481,7 @@ class Canvas(QtWidgets.QWidget):
                             self.line.points[1],
                             label=self.line.point_labels[1],
                         )
-                        self.line.points[0] = self.current.points[-1]
+                        self.line[0] = self.current[-1]
                         self.line.point_labels[0] = self.current.point_labels[-1]
                         if ev.modifiers() & QtCore.Qt.ControlModifier:
                             self.finalise()
@@ -571,7 +615,7 @@ class Canvas(QtWidgets.QWidget):
             index, shape = self.hVertex, self.hShape
             shape.highlightVertex(index, shape.MOVE_VERTEX)
         else:
-            for shape in reversed(self.shapes):
+            for shape in reversed(self._shapeIndex.query(self.shapes, point)):
                 if self.isVisible(shape) and shape.containsPoint(point):
                     self.setHiding()
                     if shape not in self.selectedShapes:
@@ -705,10 +749,17 @@ class Canvas(QtWidgets.QWidget):
             )
 
         Shape.scale = self.scale
-        for shape in self.shapes:
+        # shapes outside of the exposed area are not painted, where the margin
+        # is for the vertices and the pen
+        exposed_shapes = self._shapeIndex.query_rect(
+            self.shapes,
+            self._getExposedImageRect(event.rect()),
+            margin=(Shape.point_size * 4 + Shape.PEN_WIDTH) / self.scale,
+        )
+        for shape in exposed_shapes:
             if (shape.selected or not self._hideBackround) and self.isVisible(shape):
                 shape.fill = shape.selected or shape == self.hShape
-                shape.paint(p)
+                shape.paint(p, lod=True)
         if self.current:
             self.current.paint(p)
             assert len(self.line.points) == len(self.line.point_labels)
@@ -733,47 +784,36 @@ class Canvas(QtWidgets.QWidget):
             drawing_shape.addPoint(self.line[1])
             drawing_shape.fill = True
             drawing_shape.paint(p)
-        elif self.createMode == "ai_polygon" and self.current is not None:
-            drawing_shape = self.current.copy()
-            drawing_shape.addPoint(
-                point=self.line.points[1],
-                label=self.line.point_labels[1],
+        elif self.createMode in ["ai_polygon", "ai_mask"] and self.current is not None:
+            points = list(self.current.points)
+            point_labels = list(self.current.point_labels)
+            # same as Shape.addPoint, which closes the shape at the first point
+            if not points or self.line.points[1] != points[0]:
+                points.append(self.line.points[1])
+                point_labels.append(self.line.point_labels[1])
+            refined = self._getAiPreview(
+                points=[[point.x(), point.y()] for point in points],
+                point_labels=point_labels,
             )
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
-            )
-            if len(points) > 2:
-                drawing_shape.setShapeRefined(
-                    shape_type="polygon",
-                    points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                    point_labels=[1] * len(points),
+            if refined is not None and (
+                refined["shape_type"] == "mask" or len(refined["points"]) > 2
+            ):
+                drawing_shape = self._getAiPreviewShape(refined)
+                drawing_shape.fill = (
+                    self.fillDrawing() if self.createMode == "ai_polygon" else False
                 )
-                drawing_shape.fill = self.fillDrawing()
                 drawing_shape.selected = True
                 drawing_shape.paint(p)
-        elif self.createMode == "ai_mask" and self.current is not None:
-            drawing_shape = self.current.copy()
-            drawing_shape.addPoint(
-                point=self.line.points[1],
-                label=self.line.point_labels[1],
-            )
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
-            )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
-            drawing_shape.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
-            )
-            drawing_shape.selected = True
-            drawing_shape.paint(p)
 
         p.end()
 
+    def _getExposedImageRect(self, rect):
+        """Convert an exposed rect of the widget to image coordinates."""
+        rect = QtCore.QRectF(rect)
+        return QtCore.QRectF(
+            self.transformPos(rect.topLeft()), rect.size() / self.scale
+        )
+
     def transformPos(self, point):
         """Convert from widget-logical coordinates to painter-logical ones."""
         return point / self.scale - self.offsetToCenter()
@@ -791,35 +831,70 @@ class Canvas(QtWidgets.QWidget):
         w, h = self.pixmap.width(), self.pixmap.height()
         return not (0 <= p.x() <= w - 1 and 0 <= p.y() <= h - 1)
 
+    def _getAiPreview(self, points, point_labels):
+        # the latest finished preview, while the one of the points is predicted
+        key = (
+            self.createMode,
+            tuple(tuple(point) for point in points),
+            tuple(point_labels),
+        )
+        refined = self._aiPreviewWorker.get(key)
+        if refined is not None:
+            return refined
+        self._aiPreviewWorker.request(
+            key,
+            functools.partial(
+                _predict_ai_shape,
+                model=self._ai_model,
+                create_mode=self.createMode,
+                points=points,
+                point_labels=point_labels,
+            ),
+        )
+        latest = self._aiPreviewWorker.latest()
+        if latest is None:
+            return None
+        # only the preview of the same shape, whose clicked points except the
+        # point under the cursor are the prefix of the current ones
+        (create_mode, latest_points, latest_point_labels), refined = latest
+        num_clicked = len(latest_points) - 1
+        if (
+            create_mode != self.createMode
+            or latest_points[:num_clicked] != key[1][:num_clicked]
+            or latest_point_labels[:num_clicked] != key[2][:num_clicked]
+        ):
+            return None
+        return refined
+
+    def _clearAiPreview(self):
+        self._aiPreviewWorker.clear()
+        self._aiPreviewShape = None
+
+    def _getAiPreviewShape(self, refined):
+        # the shape is kept while the preview is the same, so that the mask
+        # image and the contours are not computed again on every paint
+        cache = self._aiPreviewShape
+        if cache is None or cache[0] is not self.current or cache[1] is not refined:
+            shape = self.current.copy()
+            shape.setShapeRefined(**refined)
+            cache = self._aiPreviewShape = (self.current, refined, shape)
+        return cache[2]
+
     def finalise(self):
         assert self.current
-        if self.createMode == "ai_polygon":
-            # convert points to polygon by an AI model
-            assert self.current.shape_type == "points"
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            self.current.setShapeRefined(
-                points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                point_labels=[1] * len(points),
-                shape_type="polygon",
-            )
-        elif self.createMode == "ai_mask":
-            # convert points to mask by an AI model
+        if self.createMode in ["ai_polygon", "ai_mask"]:
+            # convert points to polygon or mask by an AI model
             assert self.current.shape_type == "points"
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
             self.current.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
+                **_predict_ai_shape(
+                    model=self._ai_model,
+                    create_mode=self.createMode,
+                    points=[[point.x(), point.y()] for point in self.current.points],
+                    point_labels=self.current.point_labels,
+                )
             )
         self.current.close()
+        self._clearAiPreview()
 
         self.shapes.append(self.current)
         self.storeShapes()
@@ -941,6 +1016,7 @@ class Canvas(QtWidgets.QWidget):
         if self.drawing():
             if key == QtCore.Qt.Key_Escape and self.current:
                 self.current = None
+                self._clearAiPreview()
                 self.drawingPolygon.emit(False)
                 self.update()
             elif key == QtCore.Qt.Key_Return and self.canCloseShape():
@@ -1000,15 +1076,21 @@ class Canvas(QtWidgets.QWidget):
             self.line[0] = self.current[-1]
         else:
             self.current = None
+            self._clearAiPreview()
             self.drawingPolygon.emit(False)
         self.update()
 
-    def loadPixmap(self, pixmap, clear_shapes=True):
+    def loadPixmap(self, pixmap, clear_shapes=True, image_arr=None):
+        """Load pixmap to draw.
+
+        image_arr is the RGBA array of the pixmap given to AI models. It is
+        shared without copying, and created from the pixmap if not given.
+        """
         self.pixmap = pixmap
+        self._image_arr = image_arr
         if self._ai_model:
-            self._ai_model.set_image(
-                image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
-            )
+            self._ai_model.set_image(image=self._getImageArray())
+        self._clearAiPreview()
         if clear_shapes:
             self.shapes = []
         self.update()
@@ -1040,5 +1122,28 @@ class Canvas(QtWidgets.QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = None
+        self._image_arr = None
+        self._clearAiPreview()
         self.shapesBackups = []
         self.update()
+
+
+def _predict_ai_shape(model, create_mode, points, point_labels):
+    """Return keyword arguments of Shape.setShapeRefined predicted by a model."""
+    if create_mode == "ai_polygon":
+        polygon = model.predict_polygon_from_points(
+            points=points, point_labels=point_labels
+        )
+        return dict(
+            shape_type="polygon",
+            points=[QtCore.QPointF(point[0], point[1]) for point in polygon],
+            point_labels=[1] * len(polygon),
+        )
+    mask = model.predict_mask_from_points(points=points, point_labels=point_labels)
+    y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
+    return dict(
+        shape_type="mask",
+        points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
+        point_labels=[1, 1],
+        mask=mask[y1 : y2 + 1, x1 : x2 + 1],
+    )
@@ -152,6 +152,8 @@ def main():
                 "labelme_json_to_dataset=labelme.cli.json_to_dataset:main",
                 "labelme_export_json=labelme.cli.export_json:main",
                 "labelme_on_docker=labelme.cli.on_docker:main",
+                "labelme_convert_label_file=labelme.cli.convert_label_file:main",
+                "labelme_ai_server=labelme.cli.ai_server:main",
             ],
         },
     )
@@ -0,0 +1,85 @@
+import collections
+
+import numpy as np
+import pytest
+
+from labelme.ai import efficient_sam
+from labelme.ai import segment_anything_model
+
+_Input = collections.namedtuple("_Input", ["name", "shape"])
+
+
+class _EfficientSamDecoderSession(object):
+    def __init__(self, num_queries):
+        self.num_runs = 0
+        self._num_queries = num_queries
+
+    def get_inputs(self):
+        return [_Input("batched_point_coords", [1, self._num_queries, "P", 2])]
+
+    def run(self, output_names, input_feed):
+        self.num_runs += 1
+        coords = input_feed["batched_point_coords"]
+        labels = input_feed["batched_point_labels"]
+        height, width = input_feed["orig_im_size"]
+        masks = np.full((1, coords.shape[1], 3, height, width), -1, np.float32)
+        for i in range(coords.shape[1]):
+            for (x, y), label in zip(coords[0, i], labels[0, i]):
+                if label == 1:
+                    masks[0, i, :, int(y), int(x)] = 1
+        return masks, None, None
+
+
+class _SamDecoderSession(object):
+    def __init__(self, batch_size):
+        self.num_runs = 0
+        self._batch_size = batch_size
+
+    def get_inputs(self):
+        return [_Input("point_coords", [self._batch_size, "P", 2])]
+
+    def run(self, output_names, input_feed):
+        self.num_runs += 1
+        coords = input_feed["point_coords"]
+        labels = input_feed["point_labels"]
+        height, width = input_feed["orig_im_size"].astype(int)
+        masks = np.full((len(coords), 1, height, width), -1, np.float32)
+        for i in range(len(coords)):
+            for (x, y), label in zip(coords[i], labels[i]):
+                if label == 1:
+                    masks[i, :, int(y), int(x)] = 1
+        return masks, None, None
+
+
+@pytest.mark.parametrize("num_queries,num_runs", [("Q", 1), (1, 3)])
+def test_efficient_sam_compute_masks_from_points(num_queries, num_runs):
+    session = _EfficientSamDecoderSession(num_queries=num_queries)
+    masks = efficient_sam._compute_masks_from_points(
+        decoder_session=session,
+        image=np.zeros((10, 20, 4), dtype=np.uint8),
+        image_embedding=None,
+        points_list=[[[1, 2]], [[3, 4], [5, 6]], [[7, 8], [9, 9]]],
+        point_labels_list=[[1], [1, 0], [2, 3]],
+    )
+    assert session.num_runs == num_runs
+    assert len(masks) == 3
+    assert masks[0][2, 1] and masks[0].sum() == 1
+    assert masks[1][4, 3] and masks[1].sum() == 1
+    assert masks[2].sum() == 0
+
+
+@pytest.mark.parametrize("batch_size,num_runs", [("B", 1), (1, 2)])
+def test_segment_anything_model_compute_masks_from_points(batch_size, num_runs):
+    session = _SamDecoderSession(batch_size=batch_size)
+    masks = segment_anything_model._compute_masks_from_points(
+        image_size=20,
+        decoder_session=session,
+        image=np.zeros((10, 20, 4), dtype=np.uint8),
+        image_embedding=None,
+        points_list=[[[1, 2]], [[3, 4], [5, 6]]],
+        point_labels_list=[[1], [1, 1]],
+    )
+    assert session.num_runs == num_runs
+    assert len(masks) == 2
+    assert masks[0][2, 1] and masks[0].sum() == 1
+    assert masks[1][4, 3] and masks[1][6, 5] and masks[1].sum() == 2
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+from labelme.ai import EmbeddingCache
+from labelme.ai import _utils
+
+
+def test_EmbeddingCache(tmp_path):
+    embedding = np.random.rand(1, 256, 8, 8).astype(np.float32)
+    cache = EmbeddingCache(cache_dir=str(tmp_path), max_size=embedding.nbytes * 2.5)
+
+    assert cache.get("a") is None
+    cache.put("a", embedding)
+    np.testing.assert_array_equal(cache.get("a"), embedding)
+
+    cache.put("b", embedding)
+    os.utime(tmp_path / "a.npy", (0, 0))  # a is least recently used
+    cache.put("c", embedding)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.get("c") is not None
+    assert sorted(os.listdir(tmp_path)) == ["b.npy", "c.npy"]
+
+
+def test_compute_image_hash():
+    image = np.random.randint(0, 256, (30, 40, 4), dtype=np.uint8)
+    image_hash = _utils.compute_image_hash(image)
+    assert image_hash == _utils.compute_image_hash(image.copy())
+    assert image_hash != _utils.compute_image_hash(image.reshape(40, 30, 4))
+    image[0, 0, 0] += 1
+    assert image_hash != _utils.compute_image_hash(image)
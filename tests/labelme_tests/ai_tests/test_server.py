@@ -0,0 +1,113 @@
+import multiprocessing.connection
+import os.path as osp
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from labelme import ai
+
+
+class _Model(object):
+    name = "Model"
+
+    def __init__(self):
+        self._image = None
+
+    def set_image(self, image):
+        self._image = image
+
+    def prefetch_image_embedding(self, image):
+        pass
+
+    def predict_mask_from_points(self, points, point_labels):
+        mask = np.zeros(self._image.shape[:2], dtype=bool)
+        for (x, y), label in zip(points, point_labels):
+            mask[y, x] = label == 1
+        return mask
+
+
+def _start_server(tmp_path, max_images):
+    address = str(tmp_path / "ai_server.sock")
+    authkey = ai.read_authkey(str(tmp_path / "ai_server.key"), create=True)
+    thread = threading.Thread(
+        target=ai.serve,
+        kwargs=dict(
+            address=address,
+            authkey=authkey,
+            models=[_Model],
+            model_kwargs={},
+            max_images=max_images,
+        ),
+        daemon=True,
+    )
+    thread.start()
+    for _ in range(100):
+        if osp.exists(address):
+            break
+        time.sleep(0.01)
+    return address, authkey
+
+
+def test_model_client(tmp_path):
+    address, authkey = _start_server(tmp_path, max_images=1)
+
+    client1 = ai.ModelClient(name="Model", address=address, authkey=authkey)
+    client1.set_image(np.zeros((4, 5, 3), dtype=np.uint8))
+    mask = client1.predict_mask_from_points(points=[[1, 2]], point_labels=[1])
+    assert mask.shape == (4, 5)
+    assert mask[2, 1] and mask.sum() == 1
+
+    # the image of client1 is evicted, and sent again at the next prediction
+    client2 = ai.ModelClient(name="Model", address=address, authkey=authkey)
+    client2.set_image(np.zeros((6, 7, 3), dtype=np.uint8))
+    mask = client1.predict_mask_from_points(points=[[0, 0]], point_labels=[1])
+    assert mask.shape == (4, 5)
+    mask = client2.predict_mask_from_points(points=[[0, 0]], point_labels=[1])
+    assert mask.shape == (6, 7)
+
+    with pytest.raises(RuntimeError):
+        client1.predict_polygon_from_points(points=[[0, 0]], point_labels=[1])
+
+
+def test_model_client_authkey(tmp_path):
+    address, _ = _start_server(tmp_path, max_images=1)
+
+    client = ai.ModelClient(name="Model", address=address, authkey=b"wrong")
+    with pytest.raises(multiprocessing.AuthenticationError):
+        client.connect()
+
+
+def _serve_once(listener):
+    # serve set_image once, and die
+    with listener, listener.accept() as conn:
+        command, kwargs = conn.recv()
+        assert command == "set_image"
+        conn.send(("ok", "image_hash"))
+
+
+@pytest.mark.parametrize("fallback", [None, _Model])
+def test_model_client_server_dies(tmp_path, fallback):
+    address = str(tmp_path / "ai_server.sock")
+    listener = multiprocessing.connection.Listener(address, authkey=b"key")
+    thread = threading.Thread(target=_serve_once, args=(listener,), daemon=True)
+    thread.start()
+
+    client = ai.ModelClient(
+        name="Model", address=address, authkey=b"key", fallback=fallback
+    )
+    client.set_image(np.zeros((4, 5, 3), dtype=np.uint8))
+    thread.join()
+
+    if fallback is None:
+        with pytest.raises((EOFError, OSError)):
+            client.predict_mask_from_points(points=[[1, 2]], point_labels=[1])
+        return
+    # the local model is used with the image
+    mask = client.predict_mask_from_points(points=[[1, 2]], point_labels=[1])
+    assert mask.shape == (4, 5)
+    assert mask[2, 1] and mask.sum() == 1
+    client.set_image(np.zeros((6, 7, 3), dtype=np.uint8))
+    mask = client.predict_mask_from_points(points=[[0, 0]], point_labels=[1])
+    assert mask.shape == (6, 7)
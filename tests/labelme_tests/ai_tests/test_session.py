@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pytest
+
+from labelme.ai._session import create_inference_session
+
+
+def _save_model(path):
+    onnx = pytest.importorskip("onnx")
+    helper = onnx.helper
+    graph = helper.make_graph(
+        nodes=[
+            helper.make_node("Add", ["x", "one"], ["y"]),
+            helper.make_node("Add", ["y", "one"], ["z"]),
+        ],
+        name="add",
+        inputs=[helper.make_tensor_value_info("x", onnx.TensorProto.FLOAT, [2])],
+        outputs=[helper.make_tensor_value_info("z", onnx.TensorProto.FLOAT, [2])],
+        initializer=[
+            helper.make_tensor("one", onnx.TensorProto.FLOAT, [2], [1.0, 1.0])
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def test_create_inference_session(tmp_path):
+    model_path = str(tmp_path / "model.onnx")
+    _save_model(model_path)
+    optimized_model_dir = str(tmp_path / "optimized")
+
+    for _ in range(2):  # optimized and saved, then loaded
+        session = create_inference_session(
+            model_path,
+            providers=["CPUExecutionProvider"],
+            intra_op_num_threads=1,
+            optimized_model_dir=optimized_model_dir,
+        )
+        (z,) = session.run(None, {"x": np.zeros(2, dtype=np.float32)})
+        np.testing.assert_array_equal(z, [2, 2])
+        (optimized_model,) = os.listdir(optimized_model_dir)
+        assert optimized_model.startswith("model.")
@@ -0,0 +1,51 @@
+import numpy as np
+
+from labelme.ai import _utils
+from labelme.ai import text_to_annotation
+
+
+def test_get_shapes_from_annotations():
+    boxes = np.array([[2, 1, 8, 6], [0, 0, 3, 3]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    labels = np.array([0, 1], dtype=np.int32)
+    texts = ["dog", "cat"]
+
+    points_list, point_labels_list = text_to_annotation.get_box_prompts(boxes)
+    assert points_list == [[[2, 1], [8, 6]], [[0, 0], [3, 3]]]
+    assert point_labels_list == [[2, 3], [2, 3]]
+
+    mask = np.zeros((10, 10), dtype=bool)
+    mask[1:7, 2:9] = True
+    masks = [mask, np.zeros((10, 10), dtype=bool)]  # no mask for the cat
+
+    (shape,) = text_to_annotation.get_shapes_from_annotations(
+        boxes, scores, labels, texts, masks=masks, shape_type="mask"
+    )
+    assert shape["label"] == "dog"
+    assert shape["shape_type"] == "mask"
+    assert shape["points"] == [[2, 1], [8, 6]]
+    assert shape["mask"].all()
+
+    (shape,) = text_to_annotation.get_shapes_from_annotations(
+        boxes, scores, labels, texts, masks=masks, shape_type="polygon"
+    )
+    assert shape["shape_type"] == "polygon"
+    assert len(shape["points"]) >= 3
+
+    shapes = text_to_annotation.get_shapes_from_annotations(
+        boxes, scores, labels, texts
+    )
+    assert [shape["shape_type"] for shape in shapes] == ["rectangle", "rectangle"]
+
+
+def test_compute_polygon_from_mask():
+    mask = np.zeros((100, 120), dtype=bool)
+    mask[10:30, 50:90] = True
+    mask[0:3, 117:120] = True  # a smaller object at the corner
+
+    # the contours are found in the bounding box, but in image coordinates
+    polygon = _utils.compute_polygon_from_mask(mask)
+    np.testing.assert_allclose(polygon.min(axis=0), [50.5, 10.5])
+    np.testing.assert_allclose(polygon.max(axis=0), [90.5, 30.5])
+
+    assert len(_utils.compute_polygon_from_mask(np.zeros((10, 10), bool))) == 0
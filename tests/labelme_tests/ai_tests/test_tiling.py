@@ -0,0 +1,195 @@
+import collections
+import functools
+import threading
+
+import numpy as np
+
+from labelme.ai import _tiling
+from labelme.ai import segment_anything_model
+
+from .test_batched_decoding import _SamDecoderSession
+
+
+def test_get_tile():
+    image_shape = (5000, 3000)
+    assert _tiling.get_tile(image_shape, [[10, 20]], tile_size=1024) == (
+        0,
+        0,
+        1024,
+        1024,
+    )
+    # on the grid of the half of the tile
+    assert _tiling.get_tile(image_shape, [[1500, 2500]], tile_size=1024) == (
+        1024,
+        2048,
+        2048,
+        3072,
+    )
+    # clipped at the bottom-right
+    assert _tiling.get_tile(image_shape, [[2999, 4999]], tile_size=1024) == (
+        1976,
+        3976,
+        3000,
+        5000,
+    )
+    # centered if not in a tile on the grid
+    assert _tiling.get_tile(image_shape, [[100, 300], [900, 1300]], tile_size=1024) == (
+        0,
+        288,
+        1024,
+        1312,
+    )
+    assert _tiling.get_tile(image_shape, [[0, 0], [1500, 10]], tile_size=1024) is None
+
+
+def test_get_tile_size():
+    image = np.zeros((5000, 3000, 3), dtype=np.uint8)
+    assert _tiling.get_tile_size(image, tile_size=1024, min_image_size=4096) == 1024
+    assert _tiling.get_tile_size(image, tile_size=1024, min_image_size=5000) is None
+    assert _tiling.get_tile_size(image, tile_size=None, min_image_size=4096) is None
+
+
+def test_predict_masks():
+    image = np.zeros((100, 120, 4), dtype=np.uint8)
+    tile_embeddings = []
+
+    def get_tile_embedding(tile):
+        tile_embeddings.append(tile)
+        return None
+
+    masks_with_offsets = _tiling.predict_masks(
+        image=image,
+        points_list=[[[68, 80]], [[70, 82]], [[[5, 5], [115, 95]]]],
+        point_labels_list=[[1], [1], [2, 3]],
+        tile_size=32,
+        get_image_embedding=lambda: None,
+        get_tile_embedding=get_tile_embedding,
+        compute_masks=functools.partial(
+            segment_anything_model._compute_masks_from_points,
+            image_size=32,
+            decoder_session=_SamDecoderSession(batch_size="B"),
+        ),
+    )
+    # the nearby clicks share a tile and the box is in the whole image
+    assert tile_embeddings == [(48, 64, 80, 96)]
+    assert len(masks_with_offsets) == 3
+
+    mask, offset = masks_with_offsets[0]
+    assert mask.shape == (32, 32) and offset == (48, 64)
+    mask = _tiling.paste_mask(mask, offset=offset, image_shape=image.shape)
+    assert mask.shape == (100, 120)
+    assert mask[80, 68] and mask.sum() == 1
+
+    mask, offset = masks_with_offsets[2]
+    assert mask.shape == (100, 120) and offset == (0, 0)
+
+
+def test_predict_masks_object_over_tiles():
+    # an object over two tiles, segmented by the pixels of the given image
+    image = np.zeros((100, 120, 4), dtype=np.uint8)
+    image[40:50, 20:60] = 255
+    tile_embeddings = []
+
+    def get_tile_embedding(tile):
+        tile_embeddings.append(tile)
+        return "tile"
+
+    def compute_masks(image, image_embedding, points_list, point_labels_list):
+        return [image[:, :, 0] > 0 for _ in points_list]
+
+    masks_with_offsets = _tiling.predict_masks(
+        image=image,
+        points_list=[[[25, 45]], [[90, 10]]],
+        point_labels_list=[[1], [1]],
+        tile_size=32,
+        get_image_embedding=lambda: "image",
+        get_tile_embedding=get_tile_embedding,
+        compute_masks=compute_masks,
+    )
+    assert len(tile_embeddings) == 2
+
+    # cut off at the tile border, so predicted with the whole image
+    mask, offset = masks_with_offsets[0]
+    assert mask.shape == (100, 120) and offset == (0, 0)
+    assert mask.sum() == 10 * 40
+
+    # empty in the tile, so kept
+    mask, offset = masks_with_offsets[1]
+    assert mask.shape == (32, 32) and mask.sum() == 0
+
+
+class _EncoderSession(object):
+    def __init__(self):
+        self.model = None
+        self.locked = []
+
+    def run(self, output_names, input_feed):
+        self.locked.append(self.model._lock.locked())
+        return [np.zeros((1, 256, 64, 64), dtype=np.float32)]
+
+
+def _create_segment_anything_model(encoder_session):
+    # the model is built without onnx files, which cannot be downloaded in tests
+    model = segment_anything_model.SegmentAnythingModel.__new__(
+        segment_anything_model.SegmentAnythingModel
+    )
+    model._image_size = 32
+    model._encoder_session = encoder_session
+    encoder_session.model = model
+    model._decoder_session = _SamDecoderSession(batch_size="B")
+    model._lock = threading.Lock()
+    model._image_embedding_cache = collections.OrderedDict()
+    model._embedding_cache = None
+    model._embedding_cache_prefix = "sam"
+    model._tile_size = 32
+    model._min_tiled_image_size = 64
+    model._thread = None
+    return model
+
+
+def test_segment_anything_model_encode_without_lock():
+    model = _create_segment_anything_model(_EncoderSession())
+
+    model.set_image(np.zeros((100, 120, 4), dtype=np.uint8))
+    model.predict_masks_from_prompts(
+        points_list=[[[10, 10]], [[[5, 5], [115, 95]]]],
+        point_labels_list=[[1], [2, 3]],
+    )
+    # a tile and the whole image
+    assert model._encoder_session.locked == [False, False]
+
+
+class _BlockingEncoderSession(_EncoderSession):
+    def __init__(self):
+        super(_BlockingEncoderSession, self).__init__()
+        self.resume = threading.Event()
+
+    def run(self, output_names, input_feed):
+        self.resume.wait()
+        return super(_BlockingEncoderSession, self).run(output_names, input_feed)
+
+
+def test_segment_anything_model_set_cached_image():
+    model = _create_segment_anything_model(_BlockingEncoderSession())
+    model._min_tiled_image_size = 1000  # not tiled
+
+    image_b = np.ones((40, 50, 4), dtype=np.uint8)
+    image_embedding_b = np.ones((1, 256, 64, 64), dtype=np.float32)
+    model._cache_image_embedding(
+        segment_anything_model._utils.compute_image_hash(image_b), image_embedding_b
+    )
+
+    # the encoder of image a is blocked, but the cached image b does not wait
+    model.set_image(np.zeros((40, 50, 4), dtype=np.uint8))
+    model.set_image(image_b)
+    image_embeddings = []
+    thread = threading.Thread(
+        target=lambda: image_embeddings.append(model._get_image_embedding())
+    )
+    thread.start()
+    thread.join(timeout=5)
+    finished = not thread.is_alive()
+    model._encoder_session.resume.set()
+    thread.join()
+    assert finished
+    assert image_embeddings == [image_embedding_b]
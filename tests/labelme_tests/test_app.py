@@ -112,3 +112,31 @@ def test_MainWindow_annotate_jpg(qtbot):
 
     labelme.testing.assert_labelfile_sanity(out_file)
     shutil.rmtree(tmp_dir)
+
+
+@pytest.mark.gui
+def test_MainWindow_saveLabels_background(qtbot, tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    config = labelme.config.get_default_config()
+    config["store_data"] = True
+    win = labelme.app.MainWindow(config=config, filename=json_file)
+    qtbot.addWidget(win)
+    _win_show_and_wait_imageData(qtbot, win)
+
+    out_file = str(tmp_path / "apc2016_obj3.json")
+    win.otherData = {"reviewed": False}
+    shape = win.labelList[0].shape()
+    shape.flags = {"occluded": False}
+    win.saveLabels(out_file, background=True)
+    # mutated while saving, but the queued data is a copy
+    win.otherData["reviewed"] = True
+    shape.flags["occluded"] = True
+    win._autoSaver.flush()
+
+    label_file = labelme.label_file.LabelFile(out_file)
+    assert label_file.otherData == {"reviewed": False}
+    assert label_file.shapes[0]["flags"] == {"occluded": False}
+    assert label_file.imageData == win.imageData
+    # the base64 of the image data is computed in background and kept
+    assert win._imageDataB64[0] is win.imageData
+    win.close()
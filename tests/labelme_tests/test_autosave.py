@@ -0,0 +1,27 @@
+import threading
+
+from labelme._autosave import AutoSaver
+
+
+def test_auto_saver(qtbot):
+    saver = AutoSaver()
+
+    event = threading.Event()
+    saved = []
+    saver.request("a.json", lambda: (event.wait(), saved.append("a0")))
+    saver.request("b.json", lambda: saved.append("b0"))
+    saver.request("b.json", lambda: saved.append("b1"))  # coalesced
+    event.set()
+    saver.flush()
+    assert saved == ["a0", "b1"]
+
+
+def test_auto_saver_failed(qtbot):
+    saver = AutoSaver()
+
+    def save():
+        raise OSError("disk full")
+
+    with qtbot.waitSignal(saver.saveFailed) as blocker:
+        saver.request("a.json", save)
+    assert blocker.args == ["a.json", "disk full"]
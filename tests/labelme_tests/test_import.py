@@ -0,0 +1,13 @@
+import subprocess
+import sys
+
+
+def test_import_without_ai_dependencies():
+    # heavy modules of AI models are imported when an AI mode is selected
+    modules = ["gdown", "onnxruntime", "osam"]
+    code = (
+        "import sys; import labelme.__main__; "
+        "print(','.join(m for m in {!r} if m in sys.modules))".format(modules)
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == ""
@@ -0,0 +1,58 @@
+import io
+import json
+import math
+
+import numpy as np
+import pytest
+
+from labelme import _json
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+@pytest.mark.parametrize("compact", [False, True])
+def test_dump_load(monkeypatch, use_orjson, compact):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(_json, "orjson", None)
+
+    data = {
+        "floats": [1e-07, 1e20, 1.5e-300, 0.1, -2.0],
+        "numpy": {
+            "float64": np.float64(1e-07),
+            "int64": np.int64(3),
+            "bool": np.bool_(True),
+            "array": np.array([1, 2]),
+        },
+        "text": "猫",
+    }
+    f = io.BytesIO()
+    _json.dump(data, f, compact=compact)
+    f.seek(0)
+    loaded = _json.load(f)
+
+    assert loaded["floats"] == data["floats"]
+    assert loaded["numpy"] == {
+        "float64": 1e-07,
+        "int64": 3,
+        "bool": True,
+        "array": [1, 2],
+    }
+    assert loaded["text"] == "猫"
+
+    with pytest.raises(TypeError):
+        _json.dump({"object": object()}, io.BytesIO())
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_load_nan(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(_json, "orjson", None)
+
+    # written by the json module, e.g., a score of NaN
+    f = io.BytesIO(json.dumps({"score": float("nan"), "max": float("inf")}).encode())
+    loaded = _json.load(f)
+    assert math.isnan(loaded["score"])
+    assert loaded["max"] == float("inf")
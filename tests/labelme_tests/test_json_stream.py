@@ -0,0 +1,30 @@
+import io
+import json
+import os.path as osp
+
+from labelme._json_stream import JsonStreamReader
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def test_JsonStreamReader():
+    json_file = osp.join(data_dir, "annotated/2011_000003.json")
+    with open(json_file) as f:
+        data = json.load(f)
+
+    for chunk_size in [1, 7, 65536]:
+        with open(json_file) as f:
+            reader = JsonStreamReader(f, chunk_size=chunk_size)
+            data_streamed = {}
+            for key in reader.iter_object():
+                if key == "shapes":
+                    data_streamed[key] = list(reader.iter_array())
+                else:
+                    data_streamed[key] = reader.decode()
+        assert data_streamed == data
+
+
+def test_JsonStreamReader_numbers_across_chunks():
+    reader = JsonStreamReader(io.StringIO("[12345, 6.789e1, []]"), chunk_size=2)
+    assert list(reader.iter_array()) == [12345, 67.89, []]
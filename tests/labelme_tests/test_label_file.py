@@ -0,0 +1,251 @@
+import json
+import os.path as osp
+
+import numpy as np
+import PIL.Image
+
+from labelme import utils
+from labelme.label_file import LabelFile
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def test_LabelFile_load():
+    json_files = [
+        osp.join(data_dir, "annotated_with_data/apc2016_obj3.json"),
+        osp.join(data_dir, "annotated/2011_000003.json"),
+    ]
+    for json_file in json_files:
+        label_file = LabelFile(json_file)
+        assert label_file.imageData is not None
+        assert len(label_file.shapes) > 0
+
+
+def test_LabelFile_load_lazy():
+    json_files = [
+        osp.join(data_dir, "annotated_with_data/apc2016_obj3.json"),
+        osp.join(data_dir, "annotated/2011_000003.json"),
+    ]
+    for json_file in json_files:
+        label_file = LabelFile(json_file, lazy=True)
+        assert label_file._imageData is None
+        assert len(label_file.shapes) > 0
+        assert label_file.imageData == LabelFile(json_file).imageData
+
+
+def test_LabelFile_load_image_file():
+    img_file = osp.join(data_dir, "raw/2011_000003.jpg")
+    with open(img_file, "rb") as f:
+        img_data = f.read()
+    assert LabelFile.load_image_file(img_file) == img_data
+
+
+def test_LabelFile_load_image_file_exif_rotated(tmp_path):
+    img_file = str(tmp_path / "rotated.jpg")
+    exif = PIL.Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 270
+    PIL.Image.new("RGB", (40, 30)).save(img_file, exif=exif)
+
+    img_data = LabelFile.load_image_file(img_file)
+    assert utils.img_data_to_size(img_data) == (40, 30)
+
+
+def test_LabelFile_iter_shapes():
+    json_files = [
+        osp.join(data_dir, "annotated_with_data/apc2016_obj3.json"),
+        osp.join(data_dir, "annotated/2011_000003.json"),
+    ]
+    for json_file in json_files:
+        shapes = list(LabelFile.iter_shapes(json_file))
+        assert shapes == LabelFile(json_file).shapes
+
+
+def test_LabelFile_iter_shapes_mask(tmp_path):
+    mask = np.zeros((10, 20), dtype=bool)
+    mask[2:5, 3:9] = True
+    json_file = str(tmp_path / "mask.json")
+    LabelFile().save(
+        filename=json_file,
+        shapes=[
+            dict(
+                label="a",
+                points=[[0, 0], [19, 9]],
+                group_id=None,
+                description="",
+                shape_type="mask",
+                flags={},
+                mask=utils.img_arr_to_b64(mask.astype(np.uint8)),
+            )
+        ],
+        imagePath="mask.jpg",
+        imageHeight=10,
+        imageWidth=20,
+    )
+
+    (shape,) = LabelFile.iter_shapes(json_file)
+    assert isinstance(dict.__getitem__(shape, "mask"), str)
+    np.testing.assert_array_equal(shape["mask"], mask)
+
+    # every way to read the values decodes the mask
+    for get_mask in [
+        lambda shape: dict(shape)["mask"],
+        lambda shape: (lambda **kwargs: kwargs["mask"])(**shape),
+        lambda shape: dict(shape.items())["mask"],
+        lambda shape: list(shape.values())[list(shape).index("mask")],
+        lambda shape: shape.copy()["mask"],
+        lambda shape: shape.pop("mask"),
+    ]:
+        (shape,) = LabelFile.iter_shapes(json_file)
+        np.testing.assert_array_equal(get_mask(shape), mask)
+
+
+def test_LabelFile_save_binary(tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    mask = np.zeros((10, 13), dtype=bool)
+    mask[2:5, 3:9] = True
+    shapes = [dict(s["other_data"], **s) for s in label_file.shapes]
+    for shape in shapes:
+        del shape["other_data"]
+    shapes.append(
+        dict(
+            label="mask",
+            points=[[0, 0], [12, 9]],
+            group_id=None,
+            description="",
+            shape_type="mask",
+            flags={},
+            mask=mask,
+        )
+    )
+
+    binary_file = str(tmp_path / ("apc2016_obj3" + LabelFile.binary_suffix))
+    assert LabelFile.is_label_file(binary_file)
+    LabelFile().save(
+        filename=binary_file,
+        shapes=shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        imageData=label_file.imageData,
+    )
+
+    label_file_binary = LabelFile(binary_file)
+    assert label_file_binary.imageData == label_file.imageData
+    assert label_file_binary.imageHeight == label_file.imageHeight
+    assert label_file_binary.shapes[:-1] == label_file.shapes
+    np.testing.assert_array_equal(label_file_binary.shapes[-1]["mask"], mask)
+    assert len(list(LabelFile.iter_shapes(binary_file))) == len(shapes)
+
+
+def test_LabelFile_save_compact(tmp_path):
+    json_file = osp.join(data_dir, "annotated/2011_000003.json")
+    label_file = LabelFile(json_file)
+    shapes = [dict(s["other_data"], **s) for s in label_file.shapes]
+    for shape in shapes:
+        del shape["other_data"]
+
+    filenames = []
+    for compact in [False, True]:
+        filename = str(tmp_path / "{}.json".format(compact))
+        LabelFile().save(
+            filename=filename,
+            shapes=shapes,
+            imagePath=label_file.imagePath,
+            imageHeight=label_file.imageHeight,
+            imageWidth=label_file.imageWidth,
+            compact=compact,
+        )
+        filenames.append(filename)
+        with open(filename) as f:
+            assert json.load(f)["shapes"] == json.loads(json.dumps(shapes))
+
+    assert osp.getsize(filenames[1]) < osp.getsize(filenames[0])
+
+
+def test_LabelFile_save_mask_rle(tmp_path):
+    mask = np.zeros((10, 20), dtype=bool)
+    mask[2:5, 3:9] = True
+    json_file = str(tmp_path / "mask.json")
+    LabelFile().save(
+        filename=json_file,
+        shapes=[
+            dict(
+                label="a",
+                points=[[0, 0], [19, 9]],
+                group_id=None,
+                description="",
+                shape_type="mask",
+                flags={},
+                mask=mask,
+            )
+        ],
+        imagePath="mask.jpg",
+        imageHeight=10,
+        imageWidth=20,
+        mask_encoding="rle",
+    )
+
+    with open(json_file) as f:
+        assert json.load(f)["shapes"][0]["mask"]["size"] == [10, 20]
+    (shape,) = LabelFile(json_file, lazy=True).shapes
+    np.testing.assert_array_equal(shape["mask"], mask)
+    (shape,) = LabelFile.iter_shapes(json_file)
+    np.testing.assert_array_equal(shape["mask"], mask)
+
+
+def test_LabelFile_save_image_data_b64(tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    imageDataB64 = LabelFile.encode_image_data(label_file.imageData)
+    for i, b64 in enumerate([None, imageDataB64]):
+        filename = str(tmp_path / "{}.json".format(i))
+        LabelFile().save(
+            filename=filename,
+            shapes=[],
+            imagePath=label_file.imagePath,
+            imageHeight=label_file.imageHeight,
+            imageWidth=label_file.imageWidth,
+            imageData=label_file.imageData,
+            imageDataB64=b64,
+        )
+        with open(filename) as f:
+            assert json.load(f)["imageData"] == imageDataB64
+
+
+def test_convert_label_file(tmp_path, monkeypatch):
+    from labelme.cli import convert_label_file
+
+    for name, hasImageData in [
+        ("annotated_with_data/apc2016_obj3.json", True),
+        ("annotated/2011_000003.json", False),
+    ]:
+        assert LabelFile(osp.join(data_dir, name)).hasImageData == hasImageData
+
+        # image data is stored only if the input file stores it
+        binary_file = str(tmp_path / "out.labelme.npz")
+        monkeypatch.setattr(
+            "sys.argv",
+            ["labelme_convert_label_file", osp.join(data_dir, name), "-o", binary_file],
+        )
+        convert_label_file.main()
+        assert LabelFile(binary_file, lazy=True).hasImageData == hasImageData
+
+
+def test_LabelFile_save_numpy_other_data(tmp_path):
+    # both formats accept numpy values, e.g., a score of a detector
+    for suffix in [LabelFile.suffix, LabelFile.binary_suffix]:
+        filename = str(tmp_path / ("numpy" + suffix))
+        LabelFile().save(
+            filename=filename,
+            shapes=[],
+            imagePath="numpy.jpg",
+            imageHeight=10,
+            imageWidth=20,
+            otherData={"score": np.float32(0.5), "ids": np.array([1, 2])},
+        )
+        label_file = LabelFile(filename, lazy=True)
+        assert label_file.otherData == {"score": 0.5, "ids": [1, 2]}
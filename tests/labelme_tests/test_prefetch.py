@@ -0,0 +1,57 @@
+import os.path as osp
+import threading
+
+import numpy as np
+
+from labelme._prefetch import EmbeddingPrefetcher
+from labelme._prefetch import load_image_array
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+class _Model(object):
+    def __init__(self):
+        self.images = []
+        self.started = threading.Event()
+        self.resume = threading.Event()
+
+    def prefetch_image_embedding(self, image):
+        self.started.set()
+        self.resume.wait()
+        self.images.append(image)
+
+
+def test_load_image_array():
+    image = load_image_array(osp.join(data_dir, "raw/2011_000003.jpg"))
+    image_from_label_file = load_image_array(
+        osp.join(data_dir, "raw/2011_000003.jpg"),
+        label_file=osp.join(data_dir, "annotated_with_data/apc2016_obj3.json"),
+    )
+    assert image.ndim == 3 and image.shape[2] == 4
+    assert image.dtype == np.uint8
+    assert image_from_label_file.shape[2] == 4
+
+
+def test_EmbeddingPrefetcher():
+    prefetcher = EmbeddingPrefetcher(max_workers=1)
+    model = _Model()
+
+    prefetcher.prefetch(model, [lambda: "a", lambda: "b"])
+    model.started.wait()
+    prefetcher.prefetch(model, [lambda: "c"])  # cancels b
+    model.resume.set()
+    prefetcher._executor.shutdown(wait=True)
+    assert model.images == ["a", "c"]
+
+
+def test_EmbeddingPrefetcher_shutdown():
+    prefetcher = EmbeddingPrefetcher(max_workers=1)
+    model = _Model()
+
+    prefetcher.prefetch(model, [lambda: "a", lambda: "b"])
+    model.started.wait()
+    prefetcher.shutdown()  # returns while a is being encoded, and cancels b
+    model.resume.set()
+    prefetcher._executor.shutdown(wait=True)
+    assert model.images == ["a"]
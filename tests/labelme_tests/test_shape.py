@@ -0,0 +1,152 @@
+import numpy as np
+from qtpy import QtCore
+from qtpy import QtGui
+
+import labelme.utils
+from labelme import shape as shape_module
+from labelme.shape import Shape
+
+
+def test_Shape_getSerialized():
+    shape = Shape(label="cat", shape_type="polygon")
+    for x, y in [(0, 0), (10, 0), (10, 10)]:
+        shape.addPoint(QtCore.QPointF(x, y))
+
+    calls = []
+
+    def serialize(s):
+        calls.append(s)
+        return dict(label=s.label, points=[(p.x(), p.y()) for p in s.points])
+
+    data = shape.getSerialized(serialize)
+    assert data["points"] == [(0, 0), (10, 0), (10, 10)]
+    assert shape.getSerialized(serialize) is data
+    shape.selected = True
+    assert shape.getSerialized(serialize) is data
+    assert len(calls) == 1
+
+    shape.moveVertexBy(0, QtCore.QPointF(1, 1))
+    assert shape.getSerialized(serialize)["points"][0] == (1, 1)
+    shape.label = "dog"
+    assert shape.getSerialized(serialize)["label"] == "dog"
+    shape.moveBy(QtCore.QPointF(1, 0))
+    assert shape.getSerialized(serialize)["points"][0] == (2, 1)
+    assert len(calls) == 4
+
+
+def test_Shape_paint_mask(qtbot):
+    mask = np.zeros((10, 20), dtype=bool)
+    mask[2:5, 3:8] = True
+    shape = Shape(label="cat", shape_type="mask", mask=mask)
+    shape.points = [QtCore.QPointF(5, 5), QtCore.QPointF(24, 14)]
+    shape.scale = 1.0
+    shape.line_color = QtGui.QColor(0, 255, 0, 128)
+    shape.fill_color = QtGui.QColor(0, 255, 0, 128)
+    shape.select_line_color = QtGui.QColor(255, 255, 255, 255)
+    shape.select_fill_color = QtGui.QColor(0, 255, 0, 155)
+
+    image = QtGui.QImage(40, 30, QtGui.QImage.Format_RGBA8888)
+    image.fill(QtGui.QColor(0, 0, 0, 0))
+    painter = QtGui.QPainter(image)
+    shape.paint(painter)
+    qimage = shape._getMaskImage(fill_color=shape.fill_color.getRgb())
+    path = shape._getMaskContourPath()
+    shape.paint(painter)
+    painter.end()
+    assert shape._getMaskImage(fill_color=shape.fill_color.getRgb()) is qimage
+    assert shape._getMaskContourPath() is path
+    assert qimage.pixelColor(4, 3) == shape.fill_color
+    assert qimage.pixelColor(0, 0).alpha() == 0
+    assert image.pixelColor(5 + 4, 5 + 3).green() > 0
+
+    selected_qimage = shape._getMaskImage(fill_color=shape.select_fill_color.getRgb())
+    assert selected_qimage is not qimage
+    assert selected_qimage.pixelColor(4, 3) == shape.select_fill_color
+
+    shape_copy = shape.copy()
+    assert shape_copy._mask_image_cache is None
+    assert shape_copy._getMaskContourPath() is not path
+
+
+def test_Shape_geometry_cache():
+    shape = Shape(label="cat", shape_type="polygon")
+    for x, y in [(0, 0), (10, 0), (10, 10)]:
+        shape.addPoint(QtCore.QPointF(x, y))
+    shape.close()
+
+    assert shape.boundingRect() == QtCore.QRectF(0, 0, 10, 10)
+    assert shape.containsPoint(QtCore.QPointF(8, 2))
+    paths = shape._getPaintPaths()
+    assert shape._getPaintPaths() is paths
+
+    shape.moveVertexBy(2, QtCore.QPointF(10, 0))
+    assert shape.boundingRect() == QtCore.QRectF(0, 0, 20, 10)
+    shape.insertPoint(1, QtCore.QPointF(5, -5))
+    assert shape.boundingRect() == QtCore.QRectF(0, -5, 20, 15)
+    shape.removePoint(1)
+    assert shape.boundingRect() == QtCore.QRectF(0, 0, 20, 10)
+    shape.moveBy(QtCore.QPointF(100, 100))
+    assert shape.boundingRect() == QtCore.QRectF(100, 100, 20, 10)
+    assert not shape.containsPoint(QtCore.QPointF(8, 2))
+    assert shape._getPaintPaths() is not paths
+
+    paths = shape._getPaintPaths()
+    shape.highlightVertex(0, Shape.MOVE_VERTEX)
+    assert shape._getPaintPaths() is not paths
+
+
+def test_Shape_nearestVertex_nearestEdge():
+    shape = Shape(shape_type="polygon")
+    shape.scale = 2.0
+    for x, y in [(0, 0), (10, 0), (10, 10), (0, 10), (0, 10)]:
+        shape.addPoint(QtCore.QPointF(x, y))
+
+    assert shape.nearestVertex(QtCore.QPointF(9, 1), epsilon=3) == 1
+    assert shape.nearestVertex(QtCore.QPointF(9, 1), epsilon=2) is None
+    assert shape.nearestVertex(QtCore.QPointF(0, 10), epsilon=1) == 3
+
+    # the edge i is from the vertex i - 1 to the vertex i
+    assert shape.nearestEdge(QtCore.QPointF(5, 1), epsilon=3) == 1
+    assert shape.nearestEdge(QtCore.QPointF(9, 5), epsilon=3) == 2
+    assert shape.nearestEdge(QtCore.QPointF(1, 5), epsilon=3) == 0
+    assert shape.nearestEdge(QtCore.QPointF(5, 5), epsilon=3) is None
+    assert shape.nearestEdge(QtCore.QPointF(12, -1), epsilon=5) == 1
+
+    for i in range(len(shape)):
+        line = [shape[i - 1], shape[i]]
+        for point in [QtCore.QPointF(-3, 4), QtCore.QPointF(12, 5)]:
+            distances = shape_module._compute_distances_to_segments(
+                (point.x(), point.y()),
+                shape._getPointsArray()[[i - 1]],
+                shape._getPointsArray()[[i]],
+            )
+            assert np.isclose(distances[0], labelme.utils.distancetoline(point, line))
+
+    shape.moveVertexBy(1, QtCore.QPointF(10, 0))
+    assert shape.nearestVertex(QtCore.QPointF(19, 1), epsilon=3) == 1
+
+
+def test_Shape_paint_lod():
+    shape = Shape(shape_type="polygon")
+    shape.scale = 0.1
+    for x in range(0, 100, 10):
+        shape.addPoint(QtCore.QPointF(x, 0))
+    for x in range(100, 0, -10):
+        shape.addPoint(QtCore.QPointF(x, 1))
+    shape.close()
+
+    line_path, vrtx_path, _ = shape._getPaintPaths(lod=True)
+    assert vrtx_path.isEmpty()
+    # simplified to the corners
+    assert line_path.elementCount() < len(shape)
+    assert line_path.boundingRect() == QtCore.QRectF(0, 0, 10, 0.1)
+
+    _, vrtx_path, _ = shape._getPaintPaths(lod=False)
+    assert not vrtx_path.isEmpty()
+    shape.selected = True
+    _, vrtx_path, _ = shape._getPaintPaths(lod=True)
+    assert not vrtx_path.isEmpty()
+    shape.selected = False
+    shape.scale = 1.0
+    _, vrtx_path, _ = shape._getPaintPaths(lod=True)
+    assert not vrtx_path.isEmpty()
@@ -29,3 +29,11 @@ def test_img_data_to_png_data():
         img_data = f.read()
     png_data = image_module.img_data_to_png_data(img_data)
     assert isinstance(png_data, bytes)
+
+
+def test_img_data_to_size():
+    img_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.jpg")
+    with open(img_file, "rb") as f:
+        img_data = f.read()
+    height, width = image_module.img_data_to_size(img_data)
+    assert (height, width) == (907, 1210)
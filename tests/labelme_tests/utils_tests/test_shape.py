@@ -1,3 +1,5 @@
+import numpy as np
+
 from labelme.utils import shape as shape_module
 
 from .util import get_img_and_data
@@ -22,3 +24,14 @@ def test_shape_to_mask():
         points = shape["points"]
         mask = shape_module.shape_to_mask(img.shape[:2], points)
         assert mask.shape == img.shape[:2]
+
+
+def test_mask_to_rle():
+    mask = np.array([[1, 0, 0], [1, 1, 0]], dtype=bool)
+    rle = shape_module.mask_to_rle(mask)
+    assert rle == dict(size=[2, 3], counts=[0, 2, 1, 1, 2])
+    np.testing.assert_array_equal(shape_module.rle_to_mask(rle), mask)
+
+    mask = np.random.RandomState(0).rand(30, 40) > 0.5
+    rle = shape_module.mask_to_rle(mask)
+    np.testing.assert_array_equal(shape_module.rle_to_mask(rle), mask)
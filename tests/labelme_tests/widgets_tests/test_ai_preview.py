@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+from qtpy import QtCore
+
+from labelme.shape import Shape
+from labelme.widgets._ai_preview import AiPreviewWorker
+from labelme.widgets.canvas import Canvas
+
+
+def test_AiPreviewWorker(qtbot):
+    worker = AiPreviewWorker()
+
+    started = threading.Event()
+    resume = threading.Event()
+
+    def predict(value):
+        started.set()
+        resume.wait()
+        return value
+
+    worker.request("a", lambda: predict("a"))
+    # b is posted after the worker is blocked in a, so b is dropped by c
+    assert started.wait(timeout=5)
+    worker.request("b", lambda: predict("b"))
+    worker.request("c", lambda: predict("c"))
+    with qtbot.waitSignal(worker.finished):
+        resume.set()
+    qtbot.waitUntil(lambda: worker.get("c") == "c")
+    assert worker.get("b") is None
+    assert worker.latest() == ("c", "c")
+
+    worker.clear()
+    assert worker.get("c") is None
+    assert worker.latest() is None
+
+
+def test_Canvas_getAiPreview(qtbot, monkeypatch):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    canvas.createMode = "ai_polygon"
+    monkeypatch.setattr(canvas._aiPreviewWorker, "request", lambda key, predict: None)
+
+    # the preview of the previous shape, and the point under the cursor is moved
+    latest = (("ai_polygon", ((1, 1), (2, 2)), (1, 1)), "previous")
+    monkeypatch.setattr(canvas._aiPreviewWorker, "latest", lambda: latest)
+    assert canvas._getAiPreview([[5, 5], [6, 6]], [1, 1]) is None
+    assert canvas._getAiPreview([[1, 1], [3, 3]], [1, 1]) == "previous"
+    assert canvas._getAiPreview([[1, 1], [2, 2], [3, 3]], [1, 1, 1]) == "previous"
+    assert canvas._getAiPreview([[1, 1], [3, 3]], [0, 1]) is None
+    canvas.createMode = "ai_mask"
+    assert canvas._getAiPreview([[1, 1], [3, 3]], [1, 1]) is None
+
+
+def test_Canvas_getAiPreviewShape(qtbot):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    canvas.current = Shape(shape_type="points")
+
+    mask = np.zeros((3, 4), dtype=bool)
+    refined = dict(
+        shape_type="mask",
+        points=[QtCore.QPointF(1, 2), QtCore.QPointF(4, 4)],
+        point_labels=[1, 1],
+        mask=mask,
+    )
+    # the preview shape and its caches are kept while the preview is the same
+    shape = canvas._getAiPreviewShape(refined)
+    assert shape.shape_type == "mask" and shape.mask is mask
+    assert canvas._getAiPreviewShape(refined) is shape
+    assert canvas._getAiPreviewShape(dict(refined)) is not shape
+
+    canvas._clearAiPreview()
+    assert canvas._aiPreviewShape is None
@@ -0,0 +1,49 @@
+from qtpy import QtCore
+
+from labelme.shape import Shape
+from labelme.widgets._shape_index import ShapeIndex
+
+
+def _make_rectangle(x1, y1, x2, y2):
+    shape = Shape(shape_type="rectangle")
+    shape.addPoint(QtCore.QPointF(x1, y1))
+    shape.addPoint(QtCore.QPointF(x2, y2))
+    return shape
+
+
+def test_shape_index():
+    index = ShapeIndex(cell_size=10, max_cells_per_shape=4)
+    shape1 = _make_rectangle(0, 0, 5, 5)
+    shape2 = _make_rectangle(3, 3, 8, 8)
+    shape3 = _make_rectangle(100, 100, 105, 105)
+    large_shape = _make_rectangle(0, 0, 1000, 1000)
+    shapes = [shape1, shape2, shape3]
+
+    assert index.query(shapes, QtCore.QPointF(4, 4)) == [shape1, shape2]
+    assert index.query(shapes, QtCore.QPointF(50, 50)) == []
+    assert index.query(shapes, QtCore.QPointF(60, 60), margin=45) == [shape3]
+
+    # edits are reflected without notification
+    shape1.moveBy(QtCore.QPointF(100, 100))
+    assert index.query(shapes, QtCore.QPointF(4, 4)) == [shape2]
+    assert index.query(shapes, QtCore.QPointF(102, 102)) == [shape1, shape3]
+    shape2.moveVertexBy(1, QtCore.QPointF(20, 0))
+    assert index.query(shapes, QtCore.QPointF(25, 5)) == [shape2]
+
+    shapes.insert(0, large_shape)
+    shapes.remove(shape3)
+    assert index.query(shapes, QtCore.QPointF(102, 102)) == [large_shape, shape1]
+    assert index.query(shapes, QtCore.QPointF(500, 500)) == [large_shape]
+    assert index.query([], QtCore.QPointF(500, 500)) == []
+
+
+def test_shape_index_query_rect():
+    index = ShapeIndex(cell_size=10)
+    shapes = [_make_rectangle(x, x, x + 5, x + 5) for x in range(0, 100, 20)]
+
+    rect = QtCore.QRectF(15, 15, 30, 30)
+    assert index.query_rect(shapes, rect) == shapes[1:3]
+    assert index.query_rect(shapes, rect, margin=10) == shapes[0:3]
+    # more cells than the occupied ones
+    rect = QtCore.QRectF(-1000, -1000, 2000, 2000)
+    assert index.query_rect(shapes, rect) == shapes